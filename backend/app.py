@@ -58,7 +58,7 @@ def natural_sort_key(s):
     return [int(c) if c.isdigit() else c.lower() for c in re.split(r'(\d+)', str(s))]
 
 from backend.text_processor import TextProcessor
-from backend.matcher import Matcher
+from backend.matcher import Matcher, stoplist_cache_key
 from backend.scorer import Scorer
 from backend.utils import get_text_metadata, build_text_hierarchy, clean_cts_reference
 from backend.cache import (
@@ -856,7 +856,8 @@ def search():
         else:
             matches, stoplist_size = matcher.find_matches(
                 source_units, target_units, settings, 
-                corpus_frequencies=corpus_frequencies
+                corpus_frequencies=corpus_frequencies,
+                text_key=stoplist_cache_key(source_id, target_id, language, settings)
             )
         
         scored_results = scorer.score_matches(matches, source_units, target_units, settings, source_id, target_id)
@@ -927,10 +928,11 @@ def get_stoplist():
             if freq_data:
                 corpus_frequencies = freq_data.get('frequencies', {})
         
+        text_key = stoplist_cache_key(source_id, target_id, language)
         if stoplist_size > 0:
-            stopwords = matcher.build_stoplist_manual(source_units + target_units, stoplist_size, language)
+            stopwords = matcher.build_stoplist_manual(source_units + target_units, stoplist_size, language, text_key=text_key)
         else:
-            stopwords = matcher.build_stoplist(source_units, target_units, stoplist_basis, language, corpus_frequencies)
+            stopwords = matcher.build_stoplist(source_units, target_units, stoplist_basis, language, corpus_frequencies, text_key=text_key)
         
         return jsonify({
             'stopwords': sorted(list(stopwords)),
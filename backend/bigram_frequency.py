@@ -102,7 +102,7 @@ def calculate_bigram_frequencies(language, text_processor, progress_callback=Non
     if not os.path.exists(lang_dir):
         return {}
     
-    all_bigrams = []
+    freq = Counter()
     doc_bigrams = Counter()
     
     text_files = [f for f in os.listdir(lang_dir) if f.endswith('.tess')]
@@ -126,7 +126,7 @@ def calculate_bigram_frequencies(language, text_processor, progress_callback=Non
             for unit in units:
                 lemmas = unit.get('lemmas', [])
                 bigrams = extract_bigrams(lemmas)
-                all_bigrams.extend(bigrams)
+                freq.update(bigrams)
                 doc_unique_bigrams.update(bigrams)
             
             for bg in doc_unique_bigrams:
@@ -140,13 +140,13 @@ def calculate_bigram_frequencies(language, text_processor, progress_callback=Non
         elif (i + 1) % 100 == 0:
             print(f"  Processed {i + 1}/{total_docs} texts...")
     
-    freq = Counter(all_bigrams)
+    total_bigrams = sum(freq.values())
     frequencies = dict(freq.most_common())
     doc_freq_dict = dict(doc_bigrams.most_common())
     
-    data = save_bigram_cache(language, frequencies, len(all_bigrams), doc_freq_dict, total_docs)
+    data = save_bigram_cache(language, frequencies, total_bigrams, doc_freq_dict, total_docs)
     
-    print(f"  Done: {len(frequencies)} unique bigrams, {len(all_bigrams)} total occurrences")
+    print(f"  Done: {len(frequencies)} unique bigrams, {total_bigrams} total occurrences")
     return data
 
 def get_bigram_frequencies(language, text_processor=None, force_recalculate=False):
@@ -30,7 +30,7 @@ import json
 
 from backend.logging_config import get_logger
 from backend.frequency_cache import load_frequency_cache, get_corpus_frequencies
-from backend.inverted_index import get_connection, is_index_available
+from backend.inverted_index import get_connection, is_index_available, resolve_lemma_keys, decode_positions
 from backend.text_processor import get_latin_lemma_table, get_greek_lemma_table
 
 logger = get_logger('hapax')
@@ -689,7 +689,11 @@ def lookup_lemma_locations(lemma, language):
             expanded_lemmas.add(lemma.replace('u', 'v') + enc)
             expanded_lemmas.add(lemma.replace('v', 'u') + enc)
     
-    placeholders = ','.join(['?' for _ in expanded_lemmas])
+    lemma_keys = list(resolve_lemma_keys(conn, expanded_lemmas))
+    if not lemma_keys:
+        return []
+    
+    placeholders = ','.join(['?' for _ in lemma_keys])
     query = f'''
         SELECT t.filename, p.ref, p.positions
         FROM postings p
@@ -700,7 +704,7 @@ def lookup_lemma_locations(lemma, language):
     
     locations = []
     try:
-        cursor.execute(query, list(expanded_lemmas))
+        cursor.execute(query, lemma_keys)
         for row in cursor.fetchall():
             filename, ref, positions_json = row
             parts = filename.replace('.tess', '').split('.') if filename else ['unknown']
@@ -713,7 +717,7 @@ def lookup_lemma_locations(lemma, language):
                 'work': work_title.replace('_', ' ').title(),
                 'ref': ref,
                 'text': line_text or '',
-                'positions': json.loads(positions_json) if positions_json else []
+                'positions': decode_positions(positions_json) if positions_json else []
             })
     except Exception as e:
         logger.error(f"Lemma lookup error: {e}")
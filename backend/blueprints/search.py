@@ -35,6 +35,7 @@ import time
 from backend.logging_config import get_logger
 from backend.services import get_user_location, log_search
 from backend.cache import get_cached_results, save_cached_results, clear_cache
+from backend.matcher import stoplist_cache_key
 
 logger = get_logger('search')
 
@@ -188,7 +189,10 @@ def search_stream():
                 yield f"data: {json.dumps({'type': 'error', 'message': 'Use regular search endpoint for cross-lingual'})}\n\n"
                 return
             else:
-                matches, stoplist_size = _matcher.find_matches(source_units, target_units, settings, corpus_frequencies)
+                matches, stoplist_size = _matcher.find_matches(
+                    source_units, target_units, settings, corpus_frequencies,
+                    text_key=stoplist_cache_key(source_id, target_id, language, settings)
+                )
             
             if not matches:
                 result = {
@@ -439,7 +443,8 @@ def search():
         else:
             matches, stoplist_size = _matcher.find_matches(
                 source_units, target_units, settings, 
-                corpus_frequencies=corpus_frequencies
+                corpus_frequencies=corpus_frequencies,
+                text_key=stoplist_cache_key(source_id, target_id, language, settings)
             )
         
         scored_results = _scorer.score_matches(matches, source_units, target_units, settings, source_id, target_id)
@@ -501,10 +506,11 @@ def get_stoplist():
             if freq_data:
                 corpus_frequencies = freq_data.get('frequencies', {})
         
+        text_key = stoplist_cache_key(source_id, target_id, language)
         if stoplist_size > 0:
-            stopwords = _matcher.build_stoplist_manual(source_units + target_units, stoplist_size, language)
+            stopwords = _matcher.build_stoplist_manual(source_units + target_units, stoplist_size, language, text_key=text_key)
         else:
-            stopwords = _matcher.build_stoplist(source_units, target_units, stoplist_basis, language, corpus_frequencies)
+            stopwords = _matcher.build_stoplist(source_units, target_units, stoplist_basis, language, corpus_frequencies, text_key=text_key)
         
         return jsonify({
             'stopwords': sorted(list(stopwords)),
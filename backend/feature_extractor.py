@@ -6,12 +6,25 @@ Extracts and scores additional features beyond lemma matching:
 - Sound matching via character trigrams (alliteration, assonance, rhyme)
 - Metrical scansion (hexameter patterns for Latin poetry)
 """
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
 from rapidfuzz.distance import Levenshtein
 from collections import defaultdict, Counter
+from functools import lru_cache
 import json
 import os
 
+import numpy as np
+
+# Numba is optional - when available, the trigram Jaccard kernel is compiled to native code
+_NUMBA_AVAILABLE = False
+prange = range
+
+try:
+    from numba import njit, prange
+    _NUMBA_AVAILABLE = True
+except ImportError:
+    pass
+
 DEFAULT_FEATURE_WEIGHTS = {
     'lemma': 1.0,
     'pos': 0.05,
@@ -25,27 +38,112 @@ DEFAULT_FEATURE_WEIGHTS = {
     'trigram_threshold': 0.3
 }
 
+# (setting, default, feature key, threshold, coefficient) for boost_score:
+# a feature adds coefficient * score to the boost when enabled and above threshold
+BOOST_RULES = (
+    ('use_pos', False, 'pos_score', 0.5, 0.02),
+    ('use_edit_distance', True, 'edit_distance_score', 0.7, 0.1),
+    ('use_sound', True, 'sound_score', 0.3, 0.15),
+    ('use_meter', False, 'meter_score', 0.4, 0.2),
+    ('use_syntax', False, 'syntax_score', 0.4, 0.25),
+)
+
+# Compact token-match records: indices into the source/target token lists plus similarity
+MATCH_ARRAY_DTYPE = np.dtype([('src', 'u2'), ('tgt', 'u2'), ('sim', 'f8')])
+
+# Upper bound on scores held at once by find_fuzzy_token_pairs (rows x target vocabulary)
+FUZZY_BLOCK_CELLS = 1 << 22
+
 WEIGHTS_FILE = os.path.join(os.path.dirname(__file__), 'feature_weights.json')
 
+# Parsed weights keyed by the config file's mtime, so repeat loads cost one stat call
+_WEIGHTS_CACHE = {'mtime': None, 'data': None}
+
 def load_feature_weights():
     """Load feature weights from JSON config file"""
     try:
-        if os.path.exists(WEIGHTS_FILE):
-            with open(WEIGHTS_FILE, 'r') as f:
-                weights = json.load(f)
-                for key in DEFAULT_FEATURE_WEIGHTS:
-                    if key not in weights:
-                        weights[key] = DEFAULT_FEATURE_WEIGHTS[key]
-                return weights
+        mtime = os.stat(WEIGHTS_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return DEFAULT_FEATURE_WEIGHTS.copy()
+    except OSError as e:
+        print(f"Error loading feature weights: {e}")
+        return DEFAULT_FEATURE_WEIGHTS.copy()
+    
+    if _WEIGHTS_CACHE['data'] is not None and _WEIGHTS_CACHE['mtime'] == mtime:
+        return _WEIGHTS_CACHE['data'].copy()
+    
+    try:
+        with open(WEIGHTS_FILE, 'r') as f:
+            weights = json.load(f)
+            for key in DEFAULT_FEATURE_WEIGHTS:
+                if key not in weights:
+                    weights[key] = DEFAULT_FEATURE_WEIGHTS[key]
+            _WEIGHTS_CACHE['mtime'] = mtime
+            _WEIGHTS_CACHE['data'] = weights
+            return weights.copy()
     except Exception as e:
         print(f"Error loading feature weights: {e}")
     return DEFAULT_FEATURE_WEIGHTS.copy()
 
+@lru_cache(maxsize=65536)
+def _trigram_codes(token):
+    """
+    Encode a token's trigrams as a sorted array of unique int64 codes.
+    Each trigram packs its three code points (21 bits each) losslessly,
+    so equal codes mean equal trigrams.
+    """
+    token = token.lower()
+    codes = {
+        (ord(token[i]) << 42) | (ord(token[i + 1]) << 21) | ord(token[i + 2])
+        for i in range(len(token) - 2)
+    }
+    return np.array(sorted(codes), dtype=np.int64)
+
+def _pack_trigram_codes(tokens):
+    """Concatenate per-token trigram codes into one array plus row offsets."""
+    arrays = [_trigram_codes(t) for t in tokens]
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+    np.cumsum([len(a) for a in arrays], out=offsets[1:])
+    values = np.concatenate(arrays) if arrays else np.empty(0, dtype=np.int64)
+    return values, offsets
+
+def _jaccard_sorted(a, b):
+    """Jaccard similarity of two sorted unique arrays via a merge-intersection."""
+    i = j = inter = 0
+    while i < len(a) and j < len(b):
+        if a[i] == b[j]:
+            inter += 1
+            i += 1
+            j += 1
+        elif a[i] < b[j]:
+            i += 1
+        else:
+            j += 1
+    union = len(a) + len(b) - inter
+    return inter / union if union > 0 else 0.0
+
+def _jaccard_matrix(src_values, src_offsets, tgt_values, tgt_offsets):
+    """Pairwise trigram Jaccard similarity for packed source and target tokens."""
+    n_src = len(src_offsets) - 1
+    n_tgt = len(tgt_offsets) - 1
+    out = np.zeros((n_src, n_tgt), dtype=np.float64)
+    for s in prange(n_src):
+        a = src_values[src_offsets[s]:src_offsets[s + 1]]
+        for t in range(n_tgt):
+            out[s, t] = _jaccard_sorted(a, tgt_values[tgt_offsets[t]:tgt_offsets[t + 1]])
+    return out
+
+if _NUMBA_AVAILABLE:
+    _jaccard_sorted = njit(cache=True)(_jaccard_sorted)
+    _jaccard_matrix = njit(parallel=True, cache=True)(_jaccard_matrix)
+
 def save_feature_weights(weights):
     """Save feature weights to JSON config file"""
     try:
         with open(WEIGHTS_FILE, 'w') as f:
             json.dump(weights, f, indent=2)
+        _WEIGHTS_CACHE['mtime'] = None
+        _WEIGHTS_CACHE['data'] = None
         return True
     except Exception as e:
         print(f"Error saving feature weights: {e}")
@@ -183,53 +281,137 @@ class FeatureExtractor:
     def find_fuzzy_matches(self, source_tokens, target_tokens, threshold=None):
         """
         Find fuzzy matches between tokens using edit distance.
-        Returns list of (src_token, tgt_token, similarity) tuples.
+        Returns list of match dicts with source_token, target_token, similarity.
+        Threshold is 0-100 (higher = more similar required).
+        """
+        matches = self.find_fuzzy_match_array(source_tokens, target_tokens, threshold)
+        return self.fuzzy_match_dicts(matches, source_tokens, target_tokens)
+    
+    def find_fuzzy_match_array(self, source_tokens, target_tokens, threshold=None):
+        """
+        Find fuzzy matches between tokens using edit distance.
+        Returns a MATCH_ARRAY_DTYPE structured array with one (src, tgt, sim) row
+        per match, where src/tgt index into source_tokens/target_tokens and sim is 0-1.
         Threshold is 0-100 (higher = more similar required).
         """
         if threshold is None:
             threshold = self.weights.get('fuzzy_threshold', 80)
         
-        fuzzy_matches = []
+        src_positions = [i for i, token in enumerate(source_tokens) if len(token) >= 3]
+        tgt_positions = [i for i, token in enumerate(target_tokens) if len(token) >= 3]
+        if not src_positions or not tgt_positions:
+            return np.array([], dtype=MATCH_ARRAY_DTYPE)
+        src_kept = [source_tokens[i] for i in src_positions]
+        tgt_kept = [target_tokens[i] for i in tgt_positions]
+        
+        # cdist runs fuzz.ratio over the whole token grid in compiled code, with
+        # the same length-based early exit; scores under the cutoff come back as 0
+        scores = process.cdist(src_kept, tgt_kept, scorer=fuzz.ratio,
+                               score_cutoff=threshold, dtype=np.float64)
+        rows, cols = np.nonzero(scores >= threshold)
+        
+        fuzzy_matches = [
+            (src_positions[r], tgt_positions[c], scores[r, c] / 100.0)
+            for r, c in zip(rows.tolist(), cols.tolist())
+            if src_kept[r] != tgt_kept[c]
+        ]
+        
+        return np.array(fuzzy_matches, dtype=MATCH_ARRAY_DTYPE)
+    
+    def find_fuzzy_token_pairs(self, source_vocab, target_vocab, threshold=None):
+        """
+        Fuzzy-match two token vocabularies once, instead of per unit pair.
+        Returns dict mapping each source token to a dict of the target tokens it
+        matches under the same rules as find_fuzzy_match_array, with their 0-1
+        similarity.
+        """
+        if threshold is None:
+            threshold = self.weights.get('fuzzy_threshold', 80)
         
-        for src_token in source_tokens:
-            if len(src_token) < 3:
+        # Index the target vocabulary by length: fuzz.ratio can't exceed
+        # 100 * (1 - |len_s - len_t| / (len_s + len_t)), so each source length only
+        # has to be scored against a contiguous band of target lengths
+        src_by_length = defaultdict(list)
+        for token in source_vocab:
+            if len(token) >= 3:
+                src_by_length[len(token)].append(token)
+        tgt_kept = sorted((token for token in target_vocab if len(token) >= 3), key=len)
+        tgt_lengths = np.array([len(token) for token in tgt_kept], dtype=np.int64)
+        pairs = defaultdict(dict)
+        if not src_by_length or not tgt_kept:
+            return pairs
+        
+        for length, src_tokens in src_by_length.items():
+            if threshold > 0:
+                lo = np.searchsorted(tgt_lengths, length * threshold / (200 - threshold) - 1e-9, 'left')
+                hi = np.searchsorted(tgt_lengths, length * (200 - threshold) / threshold + 1e-9, 'right')
+            else:
+                lo, hi = 0, len(tgt_kept)
+            band = tgt_kept[lo:hi]
+            if not band:
                 continue
             
-            for tgt_token in target_tokens:
-                if len(tgt_token) < 3:
-                    continue
-                
-                similarity = fuzz.ratio(src_token, tgt_token)
-                if similarity >= threshold and src_token != tgt_token:
-                    fuzzy_matches.append({
-                        'source_token': src_token,
-                        'target_token': tgt_token,
-                        'similarity': similarity / 100.0
-                    })
-        
-        return fuzzy_matches
+            block_size = max(1, FUZZY_BLOCK_CELLS // len(band))
+            for block_start in range(0, len(src_tokens), block_size):
+                block = src_tokens[block_start:block_start + block_size]
+                scores = process.cdist(block, band, scorer=fuzz.ratio,
+                                       score_cutoff=threshold, dtype=np.float64)
+                rows, cols = np.nonzero(scores >= threshold)
+                for r, c in zip(rows.tolist(), cols.tolist()):
+                    if block[r] != band[c]:
+                        pairs[block[r]][band[c]] = scores[r, c] / 100.0
+        
+        return pairs
+    
+    def lookup_fuzzy_match_array(self, source_tokens, target_tokens, token_pairs):
+        """
+        Same result as find_fuzzy_match_array, read from find_fuzzy_token_pairs
+        output instead of scoring the token grid again.
+        """
+        fuzzy_matches = []
+        for src_idx, src_token in enumerate(source_tokens):
+            partners = token_pairs.get(src_token)
+            if not partners:
+                continue
+            for tgt_idx, tgt_token in enumerate(target_tokens):
+                if tgt_token in partners:
+                    fuzzy_matches.append((src_idx, tgt_idx, partners[tgt_token]))
+        
+        return np.array(fuzzy_matches, dtype=MATCH_ARRAY_DTYPE)
+    
+    def fuzzy_match_dicts(self, matches, source_tokens, target_tokens):
+        """Convert a fuzzy match array to the list-of-dicts form used in API results."""
+        return [
+            {
+                'source_token': source_tokens[src_idx],
+                'target_token': target_tokens[tgt_idx],
+                'similarity': similarity
+            }
+            for src_idx, tgt_idx, similarity in zip(
+                matches['src'].tolist(), matches['tgt'].tolist(), matches['sim'].tolist()
+            )
+        ]
     
     def get_trigrams(self, token):
         """
         Extract character trigrams from a token.
-        Returns set of 3-character sequences.
+        Returns frozenset of 3-character sequences.
         """
         if len(token) < 3:
-            return set()
+            return frozenset()
         token = token.lower()
-        return set(token[i:i+3] for i in range(len(token) - 2))
+        return frozenset([token[i:i+3] for i in range(len(token) - 2)])
     
     def get_unit_trigrams(self, tokens):
         """
         Get all trigrams for a list of tokens.
-        Returns dict mapping trigram -> list of tokens containing it.
+        Returns dict mapping trigram -> list of indices into tokens for the
+        tokens containing it (callers look up tokens[i] for the string).
         """
         trigram_index = defaultdict(list)
-        for token in tokens:
-            if len(token) < 3:
-                continue
+        for i, token in enumerate(tokens):
             for trigram in self.get_trigrams(token):
-                trigram_index[trigram].append(token)
+                trigram_index[trigram].append(i)
         return trigram_index
     
     def calculate_trigram_similarity(self, token1, token2):
@@ -254,33 +436,59 @@ class FeatureExtractor:
         Captures alliteration, assonance, consonance, rhyme patterns.
         Returns list of match dicts with similarity scores.
         """
+        matches = self.find_sound_match_array(source_tokens, target_tokens, threshold)
+        return self.sound_match_dicts(matches, source_tokens, target_tokens)
+    
+    def find_sound_match_array(self, source_tokens, target_tokens, threshold=None):
+        """
+        Find sound-similar matches between tokens using trigram overlap.
+        Returns a MATCH_ARRAY_DTYPE structured array with one (src, tgt, sim) row
+        per match, where src/tgt index into source_tokens/target_tokens.
+        """
         if threshold is None:
             threshold = self.weights.get('trigram_threshold', 0.3)
         
         sound_matches = []
         
-        for src_token in source_tokens:
+        # Build each target's trigrams once rather than per source token
+        tgt_trigram_list = [
+            (tgt_idx, self.get_trigrams(tgt_token))
+            for tgt_idx, tgt_token in enumerate(target_tokens)
+            if len(tgt_token) >= 3
+        ]
+        
+        for src_idx, src_token in enumerate(source_tokens):
             if len(src_token) < 3:
                 continue
             src_trigrams = self.get_trigrams(src_token)
             if not src_trigrams:
                 continue
             
-            for tgt_token in target_tokens:
-                if len(tgt_token) < 3:
-                    continue
-                
-                similarity = self.calculate_trigram_similarity(src_token, tgt_token)
+            for tgt_idx, tgt_trigrams in tgt_trigram_list:
+                intersection = len(src_trigrams & tgt_trigrams)
+                union = len(src_trigrams) + len(tgt_trigrams) - intersection
+                similarity = intersection / union if union > 0 else 0.0
                 
                 if similarity >= threshold:
-                    shared_trigrams = src_trigrams & self.get_trigrams(tgt_token)
-                    sound_matches.append({
-                        'source_token': src_token,
-                        'target_token': tgt_token,
-                        'similarity': similarity,
-                        'shared_trigrams': list(shared_trigrams)[:5]
-                    })
+                    sound_matches.append((src_idx, tgt_idx, similarity))
         
+        return np.array(sound_matches, dtype=MATCH_ARRAY_DTYPE)
+    
+    def sound_match_dicts(self, matches, source_tokens, target_tokens):
+        """Convert a sound match array to the list-of-dicts form used in API results."""
+        sound_matches = []
+        for src_idx, tgt_idx, similarity in zip(
+            matches['src'].tolist(), matches['tgt'].tolist(), matches['sim'].tolist()
+        ):
+            src_token = source_tokens[src_idx]
+            tgt_token = target_tokens[tgt_idx]
+            shared_trigrams = self.get_trigrams(src_token) & self.get_trigrams(tgt_token)
+            sound_matches.append({
+                'source_token': src_token,
+                'target_token': tgt_token,
+                'similarity': similarity,
+                'shared_trigrams': list(shared_trigrams)[:5]
+            })
         return sound_matches
     
     def calculate_sound_score(self, source_unit, target_unit, matched_lemmas=None):
@@ -301,6 +509,15 @@ class FeatureExtractor:
         if not src_tokens or not tgt_tokens:
             return 0.0
         
+        if _NUMBA_AVAILABLE:
+            src_values, src_offsets = _pack_trigram_codes(src_tokens)
+            tgt_values, tgt_offsets = _pack_trigram_codes(tgt_tokens)
+            best_matches = _jaccard_matrix(src_values, src_offsets, tgt_values, tgt_offsets).max(axis=1)
+            best_matches = best_matches[best_matches > 0]
+            if not len(best_matches):
+                return 0.0
+            return min(float(best_matches.mean()), 1.0)
+        
         total_similarity = 0.0
         count = 0
         
@@ -503,6 +720,18 @@ class FeatureExtractor:
             features['source_syntax'] = src_syntax
             features['target_syntax'] = tgt_syntax
         
+        features['combined_score'] = self._combined_score(features, settings)
+        
+        return features
+    
+    def _combined_score(self, features, settings):
+        """Weighted combination of the individual feature scores for enabled features."""
+        use_pos = settings.get('use_pos', False)
+        use_edit = settings.get('use_edit_distance', True)
+        use_sound = settings.get('use_sound', True)
+        use_meter = settings.get('use_meter', False)
+        use_syntax = settings.get('use_syntax', False)
+        
         lemma_weight = self.weights.get('lemma', 1.0)
         pos_weight = self.weights.get('pos', 0.05) if use_pos else 0
         edit_weight = self.weights.get('edit_distance', 0.3) if use_edit else 0
@@ -513,17 +742,80 @@ class FeatureExtractor:
         lemma_score = min(features['lemma_count'] / 5.0, 1.0) if features['lemma_count'] else 0
         
         total_weight = lemma_weight + pos_weight + edit_weight + sound_weight + meter_weight + syntax_weight
-        if total_weight > 0:
-            features['combined_score'] = min((
-                lemma_weight * lemma_score +
-                pos_weight * features['pos_score'] +
-                edit_weight * features['edit_distance_score'] +
-                sound_weight * features['sound_score'] +
-                meter_weight * features['meter_score'] +
-                syntax_weight * features['syntax_score']
-            ) / total_weight, 1.0)
+        if total_weight <= 0:
+            return 0.0
         
-        return features
+        return min((
+            lemma_weight * lemma_score +
+            pos_weight * features['pos_score'] +
+            edit_weight * features['edit_distance_score'] +
+            sound_weight * features['sound_score'] +
+            meter_weight * features['meter_score'] +
+            syntax_weight * features['syntax_score']
+        ) / total_weight, 1.0)
+    
+    def extract_features_batch(self, source_unit, target_units, matched_lemmas_list, settings=None, source_id='', target_id='', language='la'):
+        """
+        Extract features for one source unit against many target units.
+        Returns a list of feature dicts in the same order as target_units,
+        identical to calling extract_features per pair. The source scansion is
+        looked up once and meter similarity is computed for all targets in a
+        single vectorized pass.
+        """
+        settings = settings or {}
+        use_meter = settings.get('use_meter', False)
+        pair_settings = dict(settings, use_meter=False) if use_meter else settings
+        
+        results = [
+            self.extract_features(
+                source_unit, target_unit, matched_lemmas, pair_settings,
+                source_id=source_id, target_id=target_id, language=language
+            )
+            for target_unit, matched_lemmas in zip(target_units, matched_lemmas_list)
+        ]
+        
+        if use_meter:
+            self._apply_meter_scores_batch(source_unit, target_units, results, source_id, target_id)
+            for features in results:
+                features['combined_score'] = self._combined_score(features, settings)
+        
+        return results
+    
+    def _apply_meter_scores_batch(self, source_unit, target_units, results, source_id='', target_id=''):
+        """Fill meter_score and scansions into results for all targets at once."""
+        try:
+            from backend.metrical_scanner import calculate_metrical_similarity_batch
+        except ImportError:
+            from metrical_scanner import calculate_metrical_similarity_batch
+        
+        src_text = source_unit.get('text', '')
+        if not src_text:
+            return
+        
+        src_scan = self._get_scansion_with_mqdq(source_unit.get('ref', ''), src_text, source_id)
+        if not src_scan:
+            return
+        
+        tgt_scans = []
+        for target_unit in target_units:
+            tgt_text = target_unit.get('text', '')
+            tgt_scans.append(
+                self._get_scansion_with_mqdq(target_unit.get('ref', ''), tgt_text, target_id) if tgt_text else None
+            )
+        
+        scanned = [i for i, scan in enumerate(tgt_scans) if scan]
+        if not scanned:
+            return
+        
+        similarities = calculate_metrical_similarity_batch(
+            src_scan.get('pattern', ''),
+            [tgt_scans[i].get('pattern', '') for i in scanned]
+        )
+        
+        for i, similarity in zip(scanned, similarities):
+            results[i]['meter_score'] = float(similarity)
+            results[i]['source_scansion'] = src_scan
+            results[i]['target_scansion'] = tgt_scans[i]
     
     def boost_score(self, base_score, features, settings=None):
         """
@@ -537,29 +829,43 @@ class FeatureExtractor:
         settings = settings or {}
         boost = 1.0
         
-        use_pos = settings.get('use_pos', False)
-        use_edit = settings.get('use_edit_distance', True)
-        use_sound = settings.get('use_sound', True)
-        use_meter = settings.get('use_meter', False)
-        use_syntax = settings.get('use_syntax', False)
-        
-        if use_pos and features.get('pos_score', 0) > 0.5:
-            boost += 0.02 * features['pos_score']
+        for setting, default, feature_key, threshold, coefficient in BOOST_RULES:
+            if settings.get(setting, default) and features.get(feature_key, 0) > threshold:
+                boost += coefficient * features[feature_key]
         
-        if use_edit and features.get('edit_distance_score', 0) > 0.7:
-            boost += 0.1 * features['edit_distance_score']
+        result = base_score * boost
+        return min(result, 1.0)
+    
+    def boost_scores_batch(self, base_scores, features_list, settings=None):
+        """
+        Apply boost_score to many matches at once.
+        Stacks feature scores into an (N, len(BOOST_RULES)) matrix, zeroes those
+        at or below their threshold, and adds each enabled rule's column in
+        BOOST_RULES order, so the result matches boost_score exactly.
+        Returns a numpy array of boosted scores.
+        """
+        settings = settings or {}
+        base_scores = np.asarray(base_scores, dtype=np.float64)
+        if not len(base_scores):
+            return base_scores
         
-        if use_sound and features.get('sound_score', 0) > 0.3:
-            boost += 0.15 * features['sound_score']
+        feature_keys = [rule[2] for rule in BOOST_RULES]
+        thresholds = np.array([rule[3] for rule in BOOST_RULES])
         
-        if use_meter and features.get('meter_score', 0) > 0.4:
-            boost += 0.2 * features['meter_score']
+        scores = np.array(
+            [[features.get(key, 0) for key in feature_keys] if features else [0] * len(feature_keys)
+             for features in features_list],
+            dtype=np.float64
+        )
+        has_features = np.array([bool(features) for features in features_list])
         
-        if use_syntax and features.get('syntax_score', 0) > 0.4:
-            boost += 0.25 * features['syntax_score']
+        scores = np.where(scores > thresholds, scores, 0.0)
         
-        result = base_score * boost
-        return min(result, 1.0)
-
+        boosts = np.ones(len(base_scores))
+        for column, (setting, default, _, _, coefficient) in enumerate(BOOST_RULES):
+            if settings.get(setting, default):
+                boosts += coefficient * scores[:, column]
+        boosted = np.minimum(base_scores * boosts, 1.0)
+        return np.where(has_features, boosted, base_scores)
 
 feature_extractor = FeatureExtractor()
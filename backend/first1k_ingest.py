@@ -12,16 +12,23 @@ import os
 import sys
 import json
 import re
-import time
 import argparse
+import asyncio
+import aiohttp
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
 from typing import Optional, Dict, List, Tuple
+from collections import defaultdict
 from datetime import datetime
+from functools import lru_cache
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
-from backend.ogl_converter import extract_metadata, extract_sections, normalize_text, generate_tess_id
+from backend.ogl_converter import (
+    extract_metadata, handle_streamed_div, finish_streamed_sections, normalize_text, generate_tess_id, TEI_DIV
+)
 from lxml import etree
 
 CATALOG_URL = "https://raw.githubusercontent.com/OpenGreekAndLatin/First1KGreek/master/catalog.json"
@@ -29,12 +36,27 @@ BASE_RAW_URL = "https://raw.githubusercontent.com/OpenGreekAndLatin/First1KGreek
 TEXTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'texts', 'grc')
 PROVENANCE_FILE = os.path.join(os.path.dirname(__file__), 'text_provenance.json')
 CORPUS_STATUS_FILE = os.path.join(os.path.dirname(__file__), 'corpus_status.json')
+DEFAULT_CONCURRENCY = 16
+DOWNLOAD_TIMEOUT = 60
+STREAM_CHUNK_SIZE = 65536
+
+# Shared keep-alive session for synchronous requests, with retries on transient errors
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=DEFAULT_CONCURRENCY,
+    pool_maxsize=DEFAULT_CONCURRENCY,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504))
+))
+
+_RE_NONWORD = re.compile(r'[^\w\s]')
+_RE_WHITESPACE = re.compile(r'\s+')
+_RE_FILENAME_SEP = re.compile(r'[._]')
 
 
 def load_catalog() -> List[Dict]:
     """Download and parse the First1KGreek catalog."""
     print("Downloading First1KGreek catalog...")
-    response = requests.get(CATALOG_URL, timeout=30)
+    response = _SESSION.get(CATALOG_URL, timeout=30)
     response.raise_for_status()
     data = response.json()
     catalog = data.get('catalog', [])
@@ -60,16 +82,17 @@ def urn_to_path(urn: str) -> str:
     return f"{author_id}/{work_num}/{work_id}.xml"
 
 
+@lru_cache(maxsize=8192)
 def normalize_filename(author: str, title: str) -> str:
     """Create a normalized filename from author and title."""
     author = author.lower().strip()
     title = title.lower().strip()
     
-    author = re.sub(r'[^\w\s]', '', author)
-    title = re.sub(r'[^\w\s]', '', title)
+    author = _RE_NONWORD.sub('', author)
+    title = _RE_NONWORD.sub('', title)
     
-    author = re.sub(r'\s+', '_', author)
-    title = re.sub(r'\s+', '_', title)
+    author = _RE_WHITESPACE.sub('_', author)
+    title = _RE_WHITESPACE.sub('_', title)
     
     author = author[:30]
     title = title[:50]
@@ -85,7 +108,57 @@ def get_existing_texts() -> set:
     return {f for f in os.listdir(TEXTS_DIR) if f.endswith('.tess')}
 
 
-def check_duplicate(author: str, title: str, existing: set) -> bool:
+class ExistingTextIndex:
+    """Existing .tess filenames plus a token-prefix index for duplicate checks.
+    
+    Each lowercased filename is split on '.' and '_' and filed under every
+    prefix of every token, so check_duplicate only looks at files with a
+    token starting with the author's first word instead of scanning them all.
+    """
+    
+    def __init__(self, filenames=()):
+        self.filenames = set()
+        self.by_prefix = defaultdict(set)
+        for filename in filenames:
+            self.add(filename)
+    
+    def __contains__(self, filename: str) -> bool:
+        return filename in self.filenames
+    
+    def __len__(self) -> int:
+        return len(self.filenames)
+    
+    def _prefixes(self, lowered: str):
+        for token in _RE_FILENAME_SEP.split(lowered):
+            for end in range(1, len(token) + 1):
+                yield token[:end]
+    
+    def add(self, filename: str):
+        if filename in self.filenames:
+            return
+        self.filenames.add(filename)
+        lowered = filename.lower()
+        for prefix in self._prefixes(lowered):
+            self.by_prefix[prefix].add(lowered)
+    
+    def discard(self, filename: str):
+        if filename not in self.filenames:
+            return
+        self.filenames.discard(filename)
+        lowered = filename.lower()
+        for prefix in self._prefixes(lowered):
+            bucket = self.by_prefix.get(prefix)
+            if bucket is not None:
+                bucket.discard(lowered)
+                if not bucket:
+                    del self.by_prefix[prefix]
+    
+    def candidates(self, word: str) -> set:
+        """Lowercased filenames with a token starting with word."""
+        return self.by_prefix.get(word, set())
+
+
+def check_duplicate(author: str, title: str, existing: ExistingTextIndex) -> bool:
     """Check if a similar text already exists in the corpus."""
     if not author or not title:
         return False
@@ -102,62 +175,54 @@ def check_duplicate(author: str, title: str, existing: set) -> bool:
     if not author_words or not title_words:
         return False
     
-    for existing_file in existing:
-        existing_lower = existing_file.lower()
-        if author_words[0] in existing_lower and any(
-            word in existing_lower for word in title_words[:2] if len(word) > 2
-        ):
+    title_keys = [word for word in title_words[:2] if len(word) > 2]
+    for existing_lower in existing.candidates(author_words[0]):
+        if any(word in existing_lower for word in title_keys):
             return True
     return False
 
 
-def download_and_convert(entry: Dict, existing: set, dry_run: bool = False) -> Tuple[bool, str]:
-    """Download a single XML file and convert to .tess format.
+def prepare_download(entry: Dict, existing: ExistingTextIndex) -> Tuple[Optional[str], Optional[str], str]:
+    """Validate a catalog entry before downloading.
     
-    Returns: (success, message)
+    Returns: (url, output_filename, message); url is None if the entry should be skipped.
     """
     urn = entry.get('urn', '')
     author = entry.get('group_name', 'Unknown')
     title = entry.get('work_name', 'Unknown')
-    wordcount = entry.get('wordcount', 0)
     
     if not urn:
-        return False, "No URN"
+        return None, None, "No URN"
     
     filepath = urn_to_path(urn)
     if not filepath:
-        return False, "Invalid URN format"
+        return None, None, "Invalid URN format"
     
     output_filename = normalize_filename(author, title)
     
     if output_filename in existing:
-        return False, f"Already exists: {output_filename}"
+        return None, output_filename, f"Already exists: {output_filename}"
     
     if check_duplicate(author, title, existing):
-        return False, f"Probable duplicate: {author} - {title}"
-    
-    if dry_run:
-        return True, f"Would add: {author} - {title} ({wordcount} words)"
+        return None, output_filename, f"Probable duplicate: {author} - {title}"
     
-    url = f"{BASE_RAW_URL}/{filepath}"
+    return f"{BASE_RAW_URL}/{filepath}", output_filename, ""
+
+
+def write_tess_file(root, sections: List[Dict], entry: Dict, output_filename: str) -> Tuple[bool, str]:
+    """Write extracted sections of a parsed TEI document to a .tess file.
     
-    try:
-        response = requests.get(url, timeout=60)
-        response.raise_for_status()
-        xml_content = response.content
-    except requests.RequestException as e:
-        return False, f"Download failed: {e}"
+    Returns: (success, message)
+    """
+    author = entry.get('group_name', 'Unknown')
+    title = entry.get('work_name', 'Unknown')
     
     try:
-        root = etree.fromstring(xml_content)
-        
         metadata = extract_metadata(root)
         metadata['author'] = author
         metadata['title'] = title
         metadata['language'] = 'grc'
         
-        sections = extract_sections(root)
-        
         if not sections:
             return False, "No text content extracted"
         
@@ -181,6 +246,102 @@ def download_and_convert(entry: Dict, existing: set, dry_run: bool = False) -> T
         return False, f"Conversion failed: {e}"
 
 
+async def download_and_convert(session: aiohttp.ClientSession, entry: Dict, existing: ExistingTextIndex,
+                               sem: asyncio.Semaphore, dry_run: bool = False) -> Tuple[bool, str]:
+    """Download a single XML file and convert to .tess format.
+    
+    The response body is fed to an lxml pull parser chunk by chunk, so parsing
+    overlaps with the download and the full XML is never held as one bytes object.
+    
+    The duplicate checks run before the first await, so entries are claimed in
+    catalog order even though downloads overlap. A claimed filename is released
+    again if the download or conversion fails.
+    
+    Returns: (success, message)
+    """
+    url, output_filename, message = prepare_download(entry, existing)
+    if url is None:
+        return False, message
+    
+    if dry_run:
+        author = entry.get('group_name', 'Unknown')
+        title = entry.get('work_name', 'Unknown')
+        wordcount = entry.get('wordcount', 0)
+        return True, f"Would add: {author} - {title} ({wordcount} words)"
+    
+    existing.add(output_filename)
+    
+    parser = etree.XMLPullParser(events=('end',), tag=TEI_DIV)
+    sections = []
+    seen_citations = set()
+    
+    try:
+        async with sem, session.get(url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                parser.feed(chunk)
+                for _, div in parser.read_events():
+                    handle_streamed_div(div, sections, seen_citations)
+        root = parser.close()
+        for _, div in parser.read_events():
+            handle_streamed_div(div, sections, seen_citations)
+        sections = finish_streamed_sections(root, sections)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        existing.discard(output_filename)
+        return False, f"Download failed: {e}"
+    except Exception as e:
+        existing.discard(output_filename)
+        return False, f"Conversion failed: {e}"
+    
+    # Writing is disk work - keep it off the event loop
+    loop = asyncio.get_running_loop()
+    success, message = await loop.run_in_executor(None, write_tess_file, root, sections, entry, output_filename)
+    if not success:
+        existing.discard(output_filename)
+    return success, message
+
+
+async def ingest_entries(entries: List[Dict], existing: ExistingTextIndex, dry_run: bool = False,
+                         concurrency: int = DEFAULT_CONCURRENCY) -> Tuple[Dict, List[Dict]]:
+    """Download and convert catalog entries concurrently.
+    
+    Returns: (stats, new_texts)
+    """
+    stats = {'total': len(entries), 'processed': 0, 'added': 0, 'duplicates': 0, 'errors': 0}
+    new_texts = []
+    
+    sem = asyncio.Semaphore(concurrency)
+    # One pooled connector for every file: TLS is negotiated once per connection
+    # and kept alive across downloads rather than per request
+    connector = aiohttp.TCPConnector(limit_per_host=concurrency, keepalive_timeout=30, ttl_dns_cache=300)
+    timeout = aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT)
+    
+    async def run_one(entry):
+        success, message = await download_and_convert(session, entry, existing, sem, dry_run)
+        stats['processed'] += 1
+        
+        if success:
+            stats['added'] += 1
+            if not dry_run:
+                new_texts.append({
+                    'filename': normalize_filename(entry.get('group_name', ''), entry.get('work_name', '')),
+                    'urn': entry.get('urn', ''),
+                    'author': entry.get('group_name', ''),
+                    'title': entry.get('work_name', '')
+                })
+        elif 'duplicate' in message.lower() or 'already exists' in message.lower():
+            stats['duplicates'] += 1
+        else:
+            stats['errors'] += 1
+        
+        print(f"[{stats['processed']}/{len(entries)}] {message}")
+    
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        await asyncio.gather(*(run_one(entry) for entry in entries))
+    
+    return stats, new_texts
+
+
 def update_provenance(new_texts: List[Dict]):
     """Update the provenance tracking file."""
     provenance = {"sources": {}, "texts": {}}
@@ -201,12 +362,27 @@ def update_provenance(new_texts: List[Dict]):
             'date_added': datetime.now().isoformat()
         }
     
-    with open(PROVENANCE_FILE, 'w') as f:
+    # Write to a temp file and rename so a crash never leaves a torn provenance file
+    tmp_path = PROVENANCE_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
         json.dump(provenance, f, indent=2)
+    os.replace(tmp_path, PROVENANCE_FILE)
+
 
+def count_tess_files(directory: str) -> int:
+    """Count .tess files in a directory with a single scandir pass."""
+    if not os.path.isdir(directory):
+        return 0
+    with os.scandir(directory) as entries:
+        return sum(1 for entry in entries if entry.name.endswith('.tess'))
 
-def update_corpus_status(stats: Dict):
-    """Update the corpus status file with ingestion stats."""
+
+def update_corpus_status(stats: Dict, existing_grc: Optional[ExistingTextIndex] = None):
+    """Update the corpus status file with ingestion stats.
+    
+    existing_grc, when given, is the up-to-date set of Greek filenames and
+    is used for the Greek count instead of listing texts/grc again.
+    """
     status = {}
     if os.path.exists(CORPUS_STATUS_FILE):
         with open(CORPUS_STATUS_FILE, 'r') as f:
@@ -234,9 +410,9 @@ def update_corpus_status(stats: Dict):
     texts_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'texts')
     status['summary'] = {
         'total_texts': {
-            'la': len([f for f in os.listdir(os.path.join(texts_dir, 'la')) if f.endswith('.tess')]) if os.path.exists(os.path.join(texts_dir, 'la')) else 0,
-            'grc': len([f for f in os.listdir(os.path.join(texts_dir, 'grc')) if f.endswith('.tess')]) if os.path.exists(os.path.join(texts_dir, 'grc')) else 0,
-            'en': len([f for f in os.listdir(os.path.join(texts_dir, 'en')) if f.endswith('.tess')]) if os.path.exists(os.path.join(texts_dir, 'en')) else 0,
+            'la': count_tess_files(os.path.join(texts_dir, 'la')),
+            'grc': len(existing_grc) if existing_grc is not None else count_tess_files(os.path.join(texts_dir, 'grc')),
+            'en': count_tess_files(os.path.join(texts_dir, 'en')),
         }
     }
     
@@ -250,10 +426,12 @@ def main():
     parser.add_argument('--limit', type=int, default=None, help='Limit number of texts to process')
     parser.add_argument('--min-words', type=int, default=500, help='Minimum word count (default: 500)')
     parser.add_argument('--author', type=str, default=None, help='Filter by author name')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY,
+                        help=f'Maximum simultaneous downloads (default: {DEFAULT_CONCURRENCY})')
     args = parser.parse_args()
     
     catalog = load_catalog()
-    existing = get_existing_texts()
+    existing = ExistingTextIndex(get_existing_texts())
     print(f"Existing Greek texts: {len(existing)}")
     
     filtered = [
@@ -266,32 +444,7 @@ def main():
     if args.limit:
         filtered = filtered[:args.limit]
     
-    stats = {'total': len(filtered), 'processed': 0, 'added': 0, 'duplicates': 0, 'errors': 0}
-    new_texts = []
-    
-    for i, entry in enumerate(filtered):
-        success, message = download_and_convert(entry, existing, args.dry_run)
-        stats['processed'] += 1
-        
-        if success:
-            stats['added'] += 1
-            if not args.dry_run:
-                new_texts.append({
-                    'filename': normalize_filename(entry.get('group_name', ''), entry.get('work_name', '')),
-                    'urn': entry.get('urn', ''),
-                    'author': entry.get('group_name', ''),
-                    'title': entry.get('work_name', '')
-                })
-                existing.add(normalize_filename(entry.get('group_name', ''), entry.get('work_name', '')))
-        elif 'duplicate' in message.lower() or 'already exists' in message.lower():
-            stats['duplicates'] += 1
-        else:
-            stats['errors'] += 1
-        
-        print(f"[{i+1}/{len(filtered)}] {message}")
-        
-        if not args.dry_run and success:
-            time.sleep(0.5)
+    stats, new_texts = asyncio.run(ingest_entries(filtered, existing, args.dry_run, args.concurrency))
     
     print("\n" + "="*50)
     print(f"SUMMARY")
@@ -304,7 +457,7 @@ def main():
     if not args.dry_run and new_texts:
         print("\nUpdating provenance and corpus status...")
         update_provenance(new_texts)
-        update_corpus_status(stats)
+        update_corpus_status(stats, existing_grc=existing)
         print("Done!")
 
 
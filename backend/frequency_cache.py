@@ -2,7 +2,15 @@ import os
 import json
 import hashlib
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import islice
+
+# orjson is optional - it parses the large frequency caches several times faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'frequencies')
 TEXTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'texts')
@@ -10,6 +18,35 @@ TEXTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'texts')
 os.makedirs(CACHE_DIR, exist_ok=True)
 
 _frequency_cache = {}
+# st_mtime_ns of each language's cache file when it was last read or written
+_frequency_cache_mtimes = {}
+# (language, count) -> (cache data the set was built from, frozenset of stopwords)
+_stopword_cache = {}
+
+# Number of most frequent lemmas stored pre-sliced in each cache file
+TOP_STOPWORDS_SIZE = 200
+
+# Per-process TextProcessor used by calculate_corpus_frequencies workers
+_worker_text_processor = None
+
+def _init_frequency_worker(processor_class):
+    """Create one text processor per worker so models load once per process"""
+    global _worker_text_processor
+    _worker_text_processor = processor_class()
+
+def _count_file_lemmas(text_path, language, text_processor=None):
+    """Count lemmas in one text file. Returns (Counter, token_total, error or None)"""
+    text_processor = text_processor or _worker_text_processor
+    freq = Counter()
+    total = 0
+    try:
+        for unit in text_processor.process_file(text_path, language):
+            lemmas = unit['lemmas']
+            freq.update(lemmas)
+            total += len(lemmas)
+    except Exception as e:
+        return freq, total, str(e)
+    return freq, total, None
 
 def deduplicate_text_files(text_files):
     """
@@ -17,22 +54,12 @@ def deduplicate_text_files(text_files):
     Pattern: author.work.tess (full) vs author.work.part.N.tess (segment)
     If full version exists, exclude all corresponding .part.N files.
     """
-    full_versions = set()
-    for f in text_files:
-        if '.part.' not in f:
-            base = f.replace('.tess', '')
-            full_versions.add(base)
-    
-    deduplicated = []
-    for f in text_files:
-        if '.part.' in f:
-            parts = f.split('.part.')
-            base = parts[0]
-            if base in full_versions:
-                continue
-        deduplicated.append(f)
-    
-    return deduplicated
+    full_versions = {f.replace('.tess', '') for f in text_files if '.part.' not in f}
+    
+    return [
+        f for f in text_files
+        if '.part.' not in f or f.partition('.part.')[0] not in full_versions
+    ]
 
 def get_corpus_checksum(language):
     """Get a checksum of all .tess files in a language directory"""
@@ -40,31 +67,48 @@ def get_corpus_checksum(language):
     if not os.path.exists(lang_dir):
         return None
     
-    files = sorted([f for f in os.listdir(lang_dir) if f.endswith('.tess')])
-    file_info = []
-    for f in files:
-        path = os.path.join(lang_dir, f)
-        stat = os.stat(path)
-        file_info.append(f"{f}:{stat.st_size}:{stat.st_mtime}")
+    with os.scandir(lang_dir) as it:
+        entries = sorted((e for e in it if e.name.endswith('.tess')), key=lambda e: e.name)
     
-    checksum = hashlib.md5('\n'.join(file_info).encode()).hexdigest()
-    return checksum
+    digest = hashlib.blake2b(digest_size=16)
+    for entry in entries:
+        stat = entry.stat()
+        digest.update(f"{entry.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+    
+    return digest.hexdigest()
 
 def get_cache_path(language):
     """Get the path to the frequency cache file for a language"""
     return os.path.join(CACHE_DIR, f'{language}.json')
 
+def get_meta_path(language):
+    """Get the path to the small metadata sidecar of a language's frequency cache"""
+    return os.path.join(CACHE_DIR, f'{language}.meta.json')
+
 def load_frequency_cache(language):
     """Load cached frequencies for a language"""
     cache_path = get_cache_path(language)
-    if os.path.exists(cache_path):
-        try:
+    try:
+        mtime_ns = os.stat(cache_path).st_mtime_ns
+    except OSError:
+        return None
+    
+    # Unchanged file: serve the parsed copy instead of re-reading it
+    if language in _frequency_cache and _frequency_cache_mtimes.get(language) == mtime_ns:
+        return _frequency_cache[language]
+    
+    try:
+        if orjson is not None:
+            with open(cache_path, 'rb') as f:
+                data = orjson.loads(f.read())
+        else:
             with open(cache_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                _frequency_cache[language] = data
-                return data
-        except:
-            pass
+        _frequency_cache[language] = data
+        _frequency_cache_mtimes[language] = mtime_ns
+        return data
+    except:
+        pass
     return None
 
 def save_frequency_cache(language, frequencies, total_lemmas, checksum):
@@ -76,46 +120,80 @@ def save_frequency_cache(language, frequencies, total_lemmas, checksum):
         'total_lemmas': total_lemmas,
         'text_count': len([f for f in os.listdir(os.path.join(TEXTS_DIR, language)) if f.endswith('.tess')]) if os.path.exists(os.path.join(TEXTS_DIR, language)) else 0,
         'checksum': checksum,
-        'last_updated': datetime.now().isoformat()
+        'last_updated': datetime.now().isoformat(),
+        'top_stopwords': list(islice(frequencies, TOP_STOPWORDS_SIZE))
     }
     
-    with open(cache_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f)
+    # Compact encoding (the cache is never hand-edited), written to a temp file
+    # and renamed so readers never see a partially written cache
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp_path, cache_path)
+    
+    # Sidecar with just the counts, so stats don't need to parse the full cache
+    meta = {
+        'unique_lemmas': len(frequencies),
+        'total_lemmas': total_lemmas,
+        'last_updated': data['last_updated'],
+        'checksum': checksum
+    }
+    meta_path = get_meta_path(language)
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(meta_path + '.tmp', meta_path)
     
     _frequency_cache[language] = data
+    _frequency_cache_mtimes[language] = os.stat(cache_path).st_mtime_ns
     return data
 
-def calculate_corpus_frequencies(language, text_processor):
-    """Calculate lemma frequencies for entire corpus (deduplicated)"""
+def calculate_corpus_frequencies(language, text_processor, max_workers=1):
+    """
+    Calculate lemma frequencies for entire corpus (deduplicated).
+    By default files are counted in-process with text_processor, which keeps
+    request handlers and app startup free of worker pools. Offline rebuilds can
+    pass max_workers (None for the CPU count) to spread files over processes;
+    workers then build their own processor of the same class.
+    """
     lang_dir = os.path.join(TEXTS_DIR, language)
     if not os.path.exists(lang_dir):
         return {}
     
-    all_lemmas = []
+    freq = Counter()
+    total_lemmas = 0
     all_files = [f for f in os.listdir(lang_dir) if f.endswith('.tess')]
     text_files = deduplicate_text_files(all_files)
     
     print(f"Calculating corpus frequencies for {language}: {len(text_files)} texts (excluded {len(all_files) - len(text_files)} duplicate segments)...")
     
-    for i, text_file in enumerate(text_files):
-        text_path = os.path.join(lang_dir, text_file)
-        try:
-            units = text_processor.process_file(text_path, language)
-            for unit in units:
-                all_lemmas.extend(unit['lemmas'])
-        except Exception as e:
-            print(f"  Error processing {text_file}: {e}")
-        
-        if (i + 1) % 100 == 0:
-            print(f"  Processed {i + 1}/{len(text_files)} texts...")
+    # Files are independent; each yields a partial Counter that is merged here
+    text_paths = [os.path.join(lang_dir, f) for f in text_files]
+    executor = None
+    if max_workers == 1:
+        results = (_count_file_lemmas(path, language, text_processor) for path in text_paths)
+    else:
+        executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_frequency_worker,
+                                       initargs=(type(text_processor),))
+        results = executor.map(_count_file_lemmas, text_paths, [language] * len(text_paths), chunksize=16)
+    try:
+        for i, (text_file, (file_freq, file_total, error)) in enumerate(zip(text_files, results)):
+            if error:
+                print(f"  Error processing {text_file}: {error}")
+            freq.update(file_freq)
+            total_lemmas += file_total
+            
+            if (i + 1) % 100 == 0:
+                print(f"  Processed {i + 1}/{len(text_files)} texts...")
+    finally:
+        if executor is not None:
+            executor.shutdown()
     
-    freq = Counter(all_lemmas)
     frequencies = dict(freq.most_common())
     
     checksum = get_corpus_checksum(language)
-    data = save_frequency_cache(language, frequencies, len(all_lemmas), checksum)
+    data = save_frequency_cache(language, frequencies, total_lemmas, checksum)
     
-    print(f"  Done: {len(frequencies)} unique lemmas, {len(all_lemmas)} total tokens")
+    print(f"  Done: {len(frequencies)} unique lemmas, {total_lemmas} total tokens")
     return data
 
 def get_corpus_frequencies(language, text_processor=None, force_recalculate=False):
@@ -144,10 +222,21 @@ def get_cached_stopwords(language, count=50):
         cached = load_frequency_cache(language)
     
     if cached and 'frequencies' in cached:
-        freq_items = list(cached['frequencies'].items())[:count]
-        return set(lemma for lemma, _ in freq_items)
+        key = (language, count)
+        entry = _stopword_cache.get(key)
+        if entry and entry[0] is cached:
+            return entry[1]
+        
+        top = cached.get('top_stopwords')
+        if top is not None and count <= len(top):
+            stopwords = frozenset(top[:count])
+        else:
+            # Older cache files (or larger counts): frequencies is ordered most common first
+            stopwords = frozenset(islice(cached['frequencies'], count))
+        _stopword_cache[key] = (cached, stopwords)
+        return stopwords
     
-    return set()
+    return frozenset()
 
 def initialize_all_caches(text_processor):
     """Initialize frequency caches for all languages at startup"""
@@ -156,9 +245,9 @@ def initialize_all_caches(text_processor):
         if os.path.exists(lang_dir):
             get_corpus_frequencies(lang, text_processor)
 
-def recalculate_language_frequencies(language, text_processor):
+def recalculate_language_frequencies(language, text_processor, max_workers=1):
     """Recalculate frequencies for a specific language (call after adding texts)"""
-    return calculate_corpus_frequencies(language, text_processor)
+    return calculate_corpus_frequencies(language, text_processor, max_workers)
 
 def clear_frequency_cache(language=None):
     """Clear frequency cache for a language or all languages"""
@@ -170,8 +259,11 @@ def clear_frequency_cache(language=None):
         if os.path.exists(cache_path):
             os.remove(cache_path)
             cleared_count = 1
+        if os.path.exists(get_meta_path(language)):
+            os.remove(get_meta_path(language))
         if language in _frequency_cache:
             del _frequency_cache[language]
+        _frequency_cache_mtimes.pop(language, None)
         return {'cleared': cleared_count, 'language': language}
     else:
         for lang in ['la', 'grc', 'en']:
@@ -179,7 +271,10 @@ def clear_frequency_cache(language=None):
             if os.path.exists(cache_path):
                 os.remove(cache_path)
                 cleared_count += 1
+            if os.path.exists(get_meta_path(lang)):
+                os.remove(get_meta_path(lang))
         _frequency_cache.clear()
+        _frequency_cache_mtimes.clear()
         return {'cleared': cleared_count, 'all_languages': True}
 
 def get_frequency_cache_stats():
@@ -188,7 +283,17 @@ def get_frequency_cache_stats():
     total_entries = 0
     for lang in ['la', 'grc', 'en']:
         cache_path = get_cache_path(lang)
-        if os.path.exists(cache_path):
+        meta_path = get_meta_path(lang)
+        if os.path.exists(meta_path):
+            try:
+                with open(meta_path, 'r', encoding='utf-8') as f:
+                    entries = json.load(f).get('unique_lemmas', 0)
+                    stats[lang] = entries
+                    total_entries += entries
+            except:
+                stats[lang] = 0
+        elif os.path.exists(cache_path):
+            # Cache written before the metadata sidecar existed
             try:
                 with open(cache_path, 'r', encoding='utf-8') as f:
                     data = json.load(f)
@@ -200,3 +305,13 @@ def get_frequency_cache_stats():
         else:
             stats[lang] = 0
     return {'by_language': stats, 'total_entries': total_entries}
+
+if __name__ == '__main__':
+    # Offline rebuild over all CPUs: python -m backend.frequency_cache [language|all]
+    import sys
+    from backend.text_processor import TextProcessor
+    
+    lang = sys.argv[1] if len(sys.argv) > 1 else 'all'
+    processor = TextProcessor()
+    for l in (['la', 'grc', 'en'] if lang == 'all' else [lang]):
+        calculate_corpus_frequencies(l, processor, max_workers=None)
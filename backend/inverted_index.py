@@ -21,43 +21,282 @@ Usage:
 import os
 import sqlite3
 import json
+import threading
 from functools import lru_cache
+from itertools import accumulate
+
+# orjson is optional - it parses the small lemma/token arrays several times faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_loads = orjson.loads if orjson is not None else json.loads
 
 INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'inverted_index')
 
-_connections = {}
+# Each thread keeps its own connections, so threaded workers neither race on
+# opening them nor contend on one connection's mutex; index_single_text bumps
+# _generation so every thread reopens and sees the new postings
+_local = threading.local()
+_generation = 0
+
+COVERING_INDEX_SQL = 'CREATE INDEX IF NOT EXISTS idx_postings_cover ON postings(lemma, text_id, ref, positions)'
+
+# PRAGMA user_version of indexes whose postings store integer lemma ids from
+# lemma_dict instead of lemma strings; older indexes report 0
+LEMMA_DICT_VERSION = 1
+
+LEMMA_DICT_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS lemma_dict (
+        lemma_id INTEGER PRIMARY KEY,
+        lemma TEXT UNIQUE
+    )
+'''
+
+POSTINGS_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS {table} (
+        lemma INTEGER REFERENCES lemma_dict(lemma_id),
+        text_id INTEGER,
+        ref TEXT,
+        positions BLOB,
+        FOREIGN KEY (text_id) REFERENCES texts(text_id)
+    )
+'''
+
+# u→v, v→u, i→j, j→i; each axis is swapped on its own, since combining them
+# would turn 'uir' into 'vjr', which is neither the query nor the indexed form
+LATIN_VARIANT_TABLES = tuple(
+    str.maketrans(src, dst) for src, dst in (('u', 'v'), ('v', 'u'), ('i', 'j'), ('j', 'i'))
+)
+
+# IN (...) lookups bind a fixed number of parameters (padded with NULL, which
+# never matches) so SQLite can reuse one cached prepared statement per query,
+# and stay well under SQLITE_MAX_VARIABLE_NUMBER (999 on older builds)
+LOOKUP_BATCH_SIZE = 128
+_LOOKUP_PLACEHOLDERS = ','.join(['?'] * LOOKUP_BATCH_SIZE)
+
+LEMMA_DICT_LOOKUP_SQL = f'SELECT lemma_id, lemma FROM lemma_dict WHERE lemma IN ({_LOOKUP_PLACEHOLDERS})'
+
+POSTINGS_LOOKUP_SQL = f'''
+    SELECT p.lemma, t.filename, p.ref, p.positions
+    FROM postings p
+    JOIN texts t ON p.text_id = t.text_id
+    WHERE p.lemma IN ({_LOOKUP_PLACEHOLDERS})
+'''
+
+# Same rows as POSTINGS_LOOKUP_SQL, limited to lines where at least ? distinct
+# postings keys match; spelling variants count separately here, so this is a
+# superset that find_co_occurring_lemmas narrows by canonical lemma
+CO_OCCURRENCE_LOOKUP_SQL = f'''
+    WITH hits AS (
+        SELECT lemma, text_id, ref, positions
+        FROM postings
+        WHERE lemma IN ({_LOOKUP_PLACEHOLDERS})
+    ),
+    matched_lines AS (
+        SELECT text_id, ref
+        FROM hits
+        GROUP BY text_id, ref
+        HAVING COUNT(DISTINCT lemma) >= ?
+    )
+    SELECT h.lemma, t.filename, h.ref, h.positions
+    FROM hits h
+    JOIN matched_lines m ON m.text_id = h.text_id AND m.ref = h.ref
+    JOIN texts t ON h.text_id = t.text_id
+'''
+
+# WAL lets readers proceed during index_single_text writes. The mode is stored
+# in the database file, so the index writers set it rather than every reader
+INDEX_JOURNAL_PRAGMA = 'PRAGMA journal_mode=WAL'
+
+# Per-connection settings for the read-heavy workload: mmap serves hot index
+# pages without a read() copy per page
+READ_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-65536',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA mmap_size=2147483648',
+    'PRAGMA busy_timeout=5000',
+)
+
+# Index paths found on disk; misses are not cached, so an index built later by
+# scripts/build_inverted_index.py in another process is picked up on the next call
+_index_paths = {}
+
+def _index_path(language):
+    """Path to a language's index, or None if it doesn't exist"""
+    db_path = _index_paths.get(language)
+    if db_path is None:
+        db_path = os.path.join(INDEX_DIR, f'{language}_index.db')
+        if not os.path.exists(db_path):
+            return None
+        _index_paths[language] = db_path
+    return db_path
 
 def get_connection(language):
     """Get SQLite connection for a language index (lazy loading)"""
-    if language not in _connections:
-        db_path = os.path.join(INDEX_DIR, f'{language}_index.db')
-        if os.path.exists(db_path):
+    if getattr(_local, 'generation', None) != _generation:
+        # Close this thread's connections to the old index before reopening
+        for conn in getattr(_local, 'connections', {}).values():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _local.connections = {}
+        _local.generation = _generation
+    connections = _local.connections
+    if language not in connections:
+        db_path = _index_path(language)
+        if db_path:
             try:
                 conn = sqlite3.connect(db_path, check_same_thread=False)
-                conn.row_factory = sqlite3.Row
-                _connections[language] = conn
+                for pragma in READ_PRAGMAS:
+                    conn.execute(pragma)
+                connections[language] = conn
             except Exception as e:
                 print(f"Failed to open {language} index: {e}")
                 return None
         else:
             return None
-    return _connections[language]
+    return connections[language]
 
 def is_index_available(language):
     """Check if inverted index is available for a language"""
-    db_path = os.path.join(INDEX_DIR, f'{language}_index.db')
-    return os.path.exists(db_path)
+    return _index_path(language) is not None
+
+def encode_positions(positions):
+    """Encode token positions as delta-coded 7-bit varint bytes"""
+    out = bytearray()
+    prev = 0
+    for pos in sorted(positions):
+        delta = pos - prev
+        prev = pos
+        while delta >= 0x80:
+            out.append((delta & 0x7f) | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+def decode_positions(value):
+    """Decode positions stored by encode_positions (or as a JSON list in older indexes)"""
+    if isinstance(value, str):
+        return _loads(value)
+    if not value:
+        return []
+    # Positions within a line nearly always have deltas below 128, so every
+    # byte is a whole delta and a running sum decodes them
+    if max(value) < 0x80:
+        return list(accumulate(value))
+    positions = []
+    pos = delta = shift = 0
+    for byte in value:
+        delta |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            pos += delta
+            positions.append(pos)
+            delta = shift = 0
+    return positions
+
+def _lookup_batches(values):
+    """Split values into NULL-padded parameter lists of LOOKUP_BATCH_SIZE"""
+    values = list(values)
+    for i in range(0, len(values), LOOKUP_BATCH_SIZE):
+        batch = values[i:i + LOOKUP_BATCH_SIZE]
+        batch.extend([None] * (LOOKUP_BATCH_SIZE - len(batch)))
+        yield batch
+
+def get_schema_version(conn):
+    """Get the PRAGMA user_version of an index connection"""
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def resolve_lemma_keys(conn, lemmas):
+    """
+    Map the postings keys of the given lemmas back to the lemmas.
+    
+    Dictionary-encoded indexes key postings by lemma_id; older indexes key
+    them by the lemma string itself. Lemmas absent from the index are omitted.
+    """
+    if get_schema_version(conn) < LEMMA_DICT_VERSION:
+        return {lemma: lemma for lemma in lemmas}
+    
+    key_lemmas = {}
+    for batch in _lookup_batches(lemmas):
+        for lemma_id, lemma in conn.execute(LEMMA_DICT_LOOKUP_SQL, batch).fetchall():
+            key_lemmas[lemma_id] = lemma
+    return key_lemmas
+
+def get_lemma_ids(conn, lemmas):
+    """Get lemma_dict ids for lemmas, adding any that are new"""
+    conn.executemany('INSERT OR IGNORE INTO lemma_dict (lemma) VALUES (?)', [(lemma,) for lemma in lemmas])
+    return {lemma: lemma_id for lemma_id, lemma in resolve_lemma_keys(conn, lemmas).items()}
 
-def lookup_lemmas(lemmas, language):
+def migrate_lemma_dict(conn):
+    """
+    Rewrite a string-keyed postings table to dictionary-encoded lemma ids.
+    
+    Returns True if the index was migrated, False if it already was encoded.
+    """
+    if get_schema_version(conn) >= LEMMA_DICT_VERSION:
+        return False
+    
+    cursor = conn.cursor()
+    cursor.execute(LEMMA_DICT_TABLE_SQL)
+    cursor.execute('INSERT OR IGNORE INTO lemma_dict (lemma) SELECT DISTINCT lemma FROM postings')
+    cursor.execute(POSTINGS_TABLE_SQL.format(table='postings_encoded'))
+    cursor.execute('''
+        INSERT INTO postings_encoded (lemma, text_id, ref, positions)
+        SELECT d.lemma_id, p.text_id, p.ref, p.positions
+        FROM postings p
+        JOIN lemma_dict d ON d.lemma = p.lemma
+    ''')
+    cursor.execute('DROP TABLE postings')
+    cursor.execute('ALTER TABLE postings_encoded RENAME TO postings')
+    cursor.execute(COVERING_INDEX_SQL)
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_text ON postings(text_id)')
+    cursor.execute(f'PRAGMA user_version = {LEMMA_DICT_VERSION}')
+    conn.commit()
+    return True
+
+@lru_cache(maxsize=4096)
+def expand_lemma_variants(lemmas, language):
+    """
+    Expand a sorted tuple of query lemmas with their spelling variants.
+    
+    For Latin, lemmas are expanded to include both u/v and i/j variants.
+    This handles inconsistency between index (may have 'vir') and query ('uir').
+    
+    Returns:
+        (frozenset of lemmas to look up, dict mapping each variant back to
+        its original lemma); the dict is shared between calls, don't mutate it
+    """
+    expanded_lemmas = set(lemmas)
+    lemma_mapping = {}
+    for orig in lemmas:
+        lemma_mapping[orig] = orig
+        if language == 'la':
+            for table in LATIN_VARIANT_TABLES:
+                variant = orig.translate(table)
+                # Most lemmas lack one or both letters of a pair
+                if variant != orig:
+                    expanded_lemmas.add(variant)
+                    lemma_mapping[variant] = orig
+    return frozenset(expanded_lemmas), lemma_mapping
+
+def lookup_lemmas(lemmas, language, min_matches=1):
     """
     Look up multiple lemmas and return matching text locations.
     
     Args:
         lemmas: List of lemmas to search for
         language: 'la', 'grc', or 'en'
+        min_matches: Lines with fewer matching lemmas may be dropped in SQL
     
     Returns:
-        Dict mapping (text_id, ref) to list of matching lemmas and positions
+        Dict mapping (text_id, ref) to matching lemmas and positions; 'lemmas'
+        is a bare string when a line matches only one lemma, else a set
     """
     conn = get_connection(language)
     if not conn:
@@ -66,48 +305,38 @@ def lookup_lemmas(lemmas, language):
     cursor = conn.cursor()
     results = {}
     
-    # For Latin, expand lemmas to include both u/v and i/j variants
-    # This handles inconsistency between index (may have 'vir') and query ('uir')
-    expanded_lemmas = set(lemmas)
-    if language == 'la':
-        for lemma in lemmas:
-            # Add u→v and v→u variants
-            expanded_lemmas.add(lemma.replace('u', 'v'))
-            expanded_lemmas.add(lemma.replace('v', 'u'))
-            # Add i→j and j→i variants
-            expanded_lemmas.add(lemma.replace('i', 'j'))
-            expanded_lemmas.add(lemma.replace('j', 'i'))
-    
-    expanded_list = list(expanded_lemmas)
-    placeholders = ','.join(['?' for _ in expanded_list])
-    query = f'''
-        SELECT p.lemma, t.filename, p.ref, p.positions
-        FROM postings p
-        JOIN texts t ON p.text_id = t.text_id
-        WHERE p.lemma IN ({placeholders})
-    '''
+    expanded_lemmas, lemma_mapping = expand_lemma_variants(tuple(sorted(set(lemmas))), language)
     
-    # Map expanded variants back to original lemmas for consistent counting
-    lemma_mapping = {}
-    original_lemmas = set(lemmas)
-    for orig in lemmas:
-        lemma_mapping[orig] = orig
-        lemma_mapping[orig.replace('u', 'v')] = orig
-        lemma_mapping[orig.replace('v', 'u')] = orig
-        lemma_mapping[orig.replace('i', 'j')] = orig
-        lemma_mapping[orig.replace('j', 'i')] = orig
+    # Postings keys (lemma ids, or lemma strings in older indexes) -> lemma
+    key_lemmas = resolve_lemma_keys(conn, expanded_lemmas)
+    if not key_lemmas:
+        return results
+    
+    # Co-occurrence can be filtered server-side when every key fits one statement
+    if min_matches > 1 and len(key_lemmas) <= LOOKUP_BATCH_SIZE:
+        statements = [(CO_OCCURRENCE_LOOKUP_SQL, batch + [min_matches]) for batch in _lookup_batches(key_lemmas)]
+    else:
+        statements = [(POSTINGS_LOOKUP_SQL, batch) for batch in _lookup_batches(key_lemmas)]
     
     try:
-        cursor.execute(query, expanded_list)
-        for row in cursor.fetchall():
-            lemma, filename, ref, positions_json = row
-            key = (filename, ref)
-            if key not in results:
-                results[key] = {'lemmas': set(), 'positions': {}}
-            # Map back to the original query lemma for consistent matching
-            canonical = lemma_mapping.get(lemma, lemma)
-            results[key]['lemmas'].add(canonical)
-            results[key]['positions'][canonical] = json.loads(positions_json)
+        for sql, params in statements:
+            cursor.execute(sql, params)
+            for lemma_key, filename, ref, positions_json in cursor:
+                lemma = key_lemmas[lemma_key]
+                key = (filename, ref)
+                # Map back to the original query lemma for consistent matching
+                canonical = lemma_mapping.get(lemma, lemma)
+                entry = results.get(key)
+                if entry is None:
+                    # Most lines match a single lemma; only build a set on a second one
+                    results[key] = {'lemmas': canonical, 'positions': {canonical: decode_positions(positions_json)}}
+                    continue
+                matched = entry['lemmas']
+                if isinstance(matched, str) and matched != canonical:
+                    entry['lemmas'] = matched = {matched}
+                if not isinstance(matched, str):
+                    matched.add(canonical)
+                entry['positions'][canonical] = decode_positions(positions_json)
     except Exception as e:
         print(f"Index lookup error: {e}")
     
@@ -126,11 +355,15 @@ def find_co_occurring_lemmas(lemmas, language, min_matches=2, max_distance=None)
     Returns:
         List of (filename, ref, matching_lemmas, positions_dict) tuples
     """
-    all_matches = lookup_lemmas(lemmas, language)
+    all_matches = lookup_lemmas(lemmas, language, min_matches)
     
     results = []
     for (filename, ref), data in all_matches.items():
         matching_lemmas = data['lemmas']
+        if isinstance(matching_lemmas, str):
+            if min_matches > 1:
+                continue
+            matching_lemmas = {matching_lemmas}
         if len(matching_lemmas) >= min_matches:
             if max_distance is not None:
                 positions = data['positions']
@@ -139,8 +372,7 @@ def find_co_occurring_lemmas(lemmas, language, min_matches=2, max_distance=None)
                     if lemma in positions:
                         all_positions.extend(positions[lemma])
                 if len(all_positions) >= 2:
-                    all_positions.sort()
-                    min_span = all_positions[-1] - all_positions[0]
+                    min_span = max(all_positions) - min(all_positions)
                     if min_span > max_distance:
                         continue
             results.append((filename, ref, matching_lemmas, data['positions']))
@@ -154,6 +386,8 @@ def get_text_metadata(language):
         return []
     
     cursor = conn.cursor()
+    # Rows are plain tuples elsewhere; only this query is read by column name
+    cursor.row_factory = sqlite3.Row
     cursor.execute('SELECT filename, author, title, line_count FROM texts')
     return [dict(row) for row in cursor.fetchall()]
 
@@ -213,6 +447,20 @@ def ensure_lines_table(language):
     conn.commit()
     return True
 
+def ensure_indexes(language):
+    """Create the covering postings index used by lookup_lemmas if it doesn't exist"""
+    conn = get_connection(language)
+    if not conn:
+        return False
+    
+    cursor = conn.cursor()
+    # Covers every column lookup_lemmas reads, so lemma seeks never touch the table;
+    # it supersedes the old single-column idx_lemma
+    cursor.execute(COVERING_INDEX_SQL)
+    cursor.execute('DROP INDEX IF EXISTS idx_lemma')
+    conn.commit()
+    return True
+
 def get_line_data(filename, ref, language):
     """Get line content and lemmas directly from index"""
     conn = get_connection(language)
@@ -231,8 +479,8 @@ def get_line_data(filename, ref, language):
     if row:
         return {
             'text': row[0],
-            'lemmas': json.loads(row[1]) if row[1] else [],
-            'tokens': json.loads(row[2]) if row[2] else []
+            'lemmas': _loads(row[1]) if row[1] else [],
+            'tokens': _loads(row[2]) if row[2] else []
         }
     return None
 
@@ -243,20 +491,22 @@ def get_lines_batch(filename, refs, language):
         return {}
     
     cursor = conn.cursor()
+    # Sorted refs let the (text_id, ref) primary key seeks walk leaf pages in order
+    refs = sorted(set(refs))
     placeholders = ','.join(['?' for _ in refs])
     cursor.execute(f'''
         SELECT l.ref, l.content, l.lemmas, l.tokens
         FROM lines l
         JOIN texts t ON l.text_id = t.text_id
         WHERE t.filename = ? AND l.ref IN ({placeholders})
-    ''', [filename] + list(refs))
+    ''', [filename] + refs)
     
     results = {}
-    for row in cursor.fetchall():
+    for row in cursor:
         results[row[0]] = {
             'text': row[1],
-            'lemmas': json.loads(row[2]) if row[2] else [],
-            'tokens': json.loads(row[3]) if row[3] else []
+            'lemmas': _loads(row[2]) if row[2] else [],
+            'tokens': _loads(row[3]) if row[3] else []
         }
     return results
 
@@ -274,6 +524,8 @@ def has_lines_data(language):
     cursor.execute('SELECT COUNT(*) FROM lines LIMIT 1')
     return cursor.fetchone()[0] > 0
 
+INSERT_POSTING_SQL = 'INSERT INTO postings (lemma, text_id, ref, positions) VALUES (?, ?, ?, ?)'
+
 def index_single_text(filepath, language, text_processor):
     """
     Index a single text file and add it to the inverted index.
@@ -287,6 +539,7 @@ def index_single_text(filepath, language, text_processor):
     Returns:
         dict with indexing results or None on error
     """
+    global _generation
     if not os.path.exists(filepath):
         return {'error': 'File not found'}
     
@@ -298,6 +551,9 @@ def index_single_text(filepath, language, text_processor):
     
     try:
         conn = sqlite3.connect(db_path)
+        conn.execute('PRAGMA busy_timeout=5000')
+        conn.execute(INDEX_JOURNAL_PRAGMA)
+        conn.execute('PRAGMA synchronous=NORMAL')
         cursor = conn.cursor()
         
         cursor.execute('SELECT text_id FROM texts WHERE filename = ?', (filename,))
@@ -317,7 +573,11 @@ def index_single_text(filepath, language, text_processor):
         )
         text_id = cursor.lastrowid
         
-        postings_count = 0
+        encoded = get_schema_version(conn) >= LEMMA_DICT_VERSION
+        if encoded:
+            lemma_ids = get_lemma_ids(conn, {lemma for unit in units for lemma in unit.get('lemmas', [])})
+        
+        rows = []
         for unit in units:
             ref = unit.get('ref', '')
             lemmas = unit.get('lemmas', [])
@@ -329,17 +589,23 @@ def index_single_text(filepath, language, text_processor):
                 lemma_positions[lemma].append(i)
             
             for lemma, positions in lemma_positions.items():
-                cursor.execute(
-                    'INSERT INTO postings (lemma, text_id, ref, positions) VALUES (?, ?, ?, ?)',
-                    (lemma, text_id, ref, json.dumps(positions))
-                )
-                postings_count += 1
+                if encoded:
+                    lemma = lemma_ids[lemma]
+                rows.append((lemma, text_id, ref, encode_positions(positions)))
+        
+        cursor.executemany(INSERT_POSTING_SQL, rows)
+        postings_count = len(rows)
         
         conn.commit()
+        # Refresh planner stats cheaply (sampled) on the writer, so readers keep
+        # choosing the covering index for both rare and common lemmas
+        conn.execute('PRAGMA analysis_limit=400')
+        conn.execute('ANALYZE postings')
+        conn.execute('PRAGMA optimize')
         conn.close()
         
-        if language in _connections:
-            del _connections[language]
+        _generation += 1
+        _index_paths.clear()
         
         return {
             'status': 'indexed',
@@ -354,6 +620,8 @@ def index_single_text(filepath, language, text_processor):
 if __name__ == '__main__':
     for lang in ['la', 'grc']:
         if is_index_available(lang):
+            ensure_indexes(lang)
+            get_connection(lang).execute('PRAGMA optimize')
             stats = get_index_stats(lang)
             print(f"{lang.upper()}: {stats}")
         else:
@@ -5,7 +5,25 @@ Pre-computes and caches lemmatized text units for faster searches
 import os
 import json
 import hashlib
+import mmap
+import sqlite3
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
+from functools import lru_cache
+
+# orjson is optional - it serializes and parses cached units several times faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# blake3 is optional - its SIMD hashing is several times faster than MD5 on large texts
+try:
+    import blake3
+except ImportError:
+    blake3 = None
 
 CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'lemmas')
 TEXTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'texts')
@@ -14,62 +32,180 @@ def ensure_cache_dir():
     """Ensure the lemma cache directory exists"""
     os.makedirs(CACHE_DIR, exist_ok=True)
 
+@lru_cache(maxsize=4096)
+def _hash_file(filepath, mtime_ns, size):
+    """Hash file content; mtime and size are part of the key so edits rehash"""
+    hasher = blake3.blake3() if blake3 else hashlib.blake2b(digest_size=32)
+    if size:
+        # Hash straight from the page cache instead of copying into a bytes object
+        with open(filepath, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            hasher.update(mm)
+    return hasher.hexdigest()
+
 def get_file_hash(filepath):
-    """Get MD5 hash of file content to detect changes"""
-    with open(filepath, 'rb') as f:
-        return hashlib.md5(f.read()).hexdigest()
+    """Get BLAKE3 (or BLAKE2b) hash of file content to detect changes"""
+    st = os.stat(filepath)
+    return _hash_file(filepath, st.st_mtime_ns, st.st_size)
+
+# One SQLite database per language, cache/lemmas/<lang>.db; a per-text JSON
+# file it replaces is imported the first time its text has no row, then deleted
+CACHE_TABLE_SQL = '''
+    CREATE TABLE IF NOT EXISTS cache (
+        text_id TEXT PRIMARY KEY,
+        file_hash TEXT,
+        units_line BLOB,
+        units_phrase BLOB,
+        cached_at TEXT
+    )
+'''
+
+_connections = {}
+_write_lock = threading.Lock()
+_reported_corrupt = set()
+
+def get_cache_db_path(language):
+    """Get path to a language's lemma cache database"""
+    return os.path.join(CACHE_DIR, f"{language}.db")
+
+def get_cache_connection(language):
+    """Get SQLite connection for a language's lemma cache (created on first use)"""
+    if language not in _connections:
+        ensure_cache_dir()
+        conn = sqlite3.connect(get_cache_db_path(language), check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        conn.execute(CACHE_TABLE_SQL)
+        conn.commit()
+        _connections[language] = conn
+    return _connections[language]
+
+def _pack_units(units):
+    """Serialize units as zlib-compressed compact JSON"""
+    if orjson is not None:
+        return zlib.compress(orjson.dumps(units))
+    return zlib.compress(json.dumps(units, separators=(',', ':')).encode('utf-8'))
+
+def _unpack_units(blob):
+    """Inverse of _pack_units"""
+    data = zlib.decompress(blob)
+    return orjson.loads(data) if orjson is not None else json.loads(data)
 
 def get_cache_path(text_id, language):
-    """Get path to cached lemma file"""
+    """Get path to a legacy per-text cached lemma file"""
     safe_id = text_id.replace('/', '_').replace('.tess', '')
     return os.path.join(CACHE_DIR, language, f"{safe_id}.json")
 
-def get_cached_units(text_id, language):
-    """Load pre-computed units from cache if available and valid"""
+def _report_corrupt(text_id, language, error):
+    """Print a warning the first time a text's cache entry fails to decode"""
+    if (text_id, language) not in _reported_corrupt:
+        _reported_corrupt.add((text_id, language))
+        print(f"Unreadable lemma cache for {language}/{text_id}, will re-lemmatize: {error}")
+
+def _import_legacy_cache(text_id, language, text_path, current_hash):
+    """
+    Import a per-text JSON cache file written before the cache moved to SQLite,
+    then delete it so later misses don't read it again. Legacy entries carry an
+    MD5 of the text, so that is what they are validated against.
+    """
     cache_path = get_cache_path(text_id, language)
     if not os.path.exists(cache_path):
         return None
+    try:
+        if orjson is not None:
+            with open(cache_path, 'rb') as f:
+                cached = orjson.loads(f.read())
+        else:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+    except (json.JSONDecodeError, IOError) as e:
+        _report_corrupt(text_id, language, e)
+        cached = None
     
+    if cached:
+        with open(text_path, 'rb') as f:
+            legacy_hash = hashlib.md5(f.read()).hexdigest()
+        if cached.get('file_hash') == legacy_hash:
+            cached['file_hash'] = current_hash
+            save_cached_units(text_id, language, cached['units_line'], cached['units_phrase'], current_hash)
+        else:
+            cached = None
+    
+    try:
+        os.remove(cache_path)
+    except OSError:
+        pass
+    return cached
+
+def get_cached_units(text_id, language):
+    """Load pre-computed units from cache if available and valid"""
     text_path = os.path.join(TEXTS_DIR, language, text_id)
     if not os.path.exists(text_path):
         return None
     
     try:
-        with open(cache_path, 'r', encoding='utf-8') as f:
-            cached = json.load(f)
-        
-        current_hash = get_file_hash(text_path)
-        if cached.get('file_hash') != current_hash:
-            return None
-        
-        return cached
-    except (json.JSONDecodeError, IOError):
+        row = get_cache_connection(language).execute(
+            'SELECT file_hash, cached_at, units_line, units_phrase FROM cache WHERE text_id = ?',
+            (text_id,)
+        ).fetchone()
+    except sqlite3.Error:
+        return None
+    
+    current_hash = get_file_hash(text_path)
+    if row is None:
+        return _import_legacy_cache(text_id, language, text_path, current_hash)
+    
+    file_hash, cached_at, units_line, units_phrase = row
+    # Compare hashes before paying for decompression and parsing
+    if file_hash != current_hash:
+        return None
+    
+    try:
+        return {
+            'text_id': text_id,
+            'language': language,
+            'file_hash': file_hash,
+            'cached_at': cached_at,
+            'units_line': _unpack_units(units_line),
+            'units_phrase': _unpack_units(units_phrase)
+        }
+    except (zlib.error, ValueError) as e:
+        _report_corrupt(text_id, language, e)
         return None
 
 def save_cached_units(text_id, language, units_line, units_phrase, file_hash):
     """Save pre-computed units to cache"""
-    ensure_cache_dir()
-    lang_dir = os.path.join(CACHE_DIR, language)
-    os.makedirs(lang_dir, exist_ok=True)
-    
-    cache_path = get_cache_path(text_id, language)
-    cache_data = {
-        'text_id': text_id,
-        'language': language,
-        'file_hash': file_hash,
-        'cached_at': datetime.now().isoformat(),
-        'units_line': units_line,
-        'units_phrase': units_phrase
-    }
-    
     try:
-        with open(cache_path, 'w', encoding='utf-8') as f:
-            json.dump(cache_data, f)
+        conn = get_cache_connection(language)
+        with _write_lock:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (text_id, file_hash, units_line, units_phrase, cached_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (text_id, file_hash, _pack_units(units_line), _pack_units(units_phrase),
+                 datetime.now().isoformat())
+            )
+            conn.commit()
         return True
-    except IOError:
+    except (sqlite3.Error, IOError):
         return False
 
-def rebuild_lemma_cache(language, text_processor, progress_callback=None):
+_worker_text_processor = None
+
+def _init_lemma_worker(processor_class):
+    """Create one text processor per worker so models load once per process"""
+    global _worker_text_processor
+    _worker_text_processor = processor_class()
+
+def _rebuild_one(lang_dir, text_file, language):
+    """Lemmatize one text. Returns (file_hash, units_line, units_phrase)"""
+    filepath = os.path.join(lang_dir, text_file)
+    file_hash = get_file_hash(filepath)
+    
+    units_line = _worker_text_processor.process_file(filepath, language, 'line')
+    units_phrase = _worker_text_processor.process_file(filepath, language, 'phrase')
+    return file_hash, units_line, units_phrase
+
+def rebuild_lemma_cache(language, text_processor, progress_callback=None, max_workers=None):
     """Rebuild lemma cache for all texts in a language"""
     lang_dir = os.path.join(TEXTS_DIR, language)
     if not os.path.exists(lang_dir):
@@ -80,22 +216,27 @@ def rebuild_lemma_cache(language, text_processor, progress_callback=None):
     processed = 0
     errors = []
     
-    for text_file in text_files:
-        try:
-            filepath = os.path.join(lang_dir, text_file)
-            file_hash = get_file_hash(filepath)
-            
-            units_line = text_processor.process_file(filepath, language, 'line')
-            units_phrase = text_processor.process_file(filepath, language, 'phrase')
-            
-            save_cached_units(text_file, language, units_line, units_phrase, file_hash)
-            processed += 1
-            
-            if progress_callback:
-                progress_callback(processed, total, text_file)
+    # Lemmatization is CPU-bound and independent per file; workers build their
+    # own processor of the same class, and results are saved here in the parent
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_lemma_worker,
+                             initargs=(type(text_processor),)) as executor:
+        futures = {
+            executor.submit(_rebuild_one, lang_dir, text_file, language): text_file
+            for text_file in text_files
+        }
+        for future in as_completed(futures):
+            text_file = futures[future]
+            try:
+                file_hash, units_line, units_phrase = future.result()
+                
+                save_cached_units(text_file, language, units_line, units_phrase, file_hash)
+                processed += 1
                 
-        except Exception as e:
-            errors.append(f"{text_file}: {str(e)}")
+                if progress_callback:
+                    progress_callback(processed, total, text_file)
+                    
+            except Exception as e:
+                errors.append(f"{text_file}: {str(e)}")
     
     return {
         'success': True,
@@ -110,11 +251,10 @@ def get_cache_stats():
     stats = {}
     
     for lang in ['la', 'grc', 'en']:
-        lang_cache_dir = os.path.join(CACHE_DIR, lang)
         lang_text_dir = os.path.join(TEXTS_DIR, lang)
         
-        if os.path.exists(lang_cache_dir):
-            cached_count = len([f for f in os.listdir(lang_cache_dir) if f.endswith('.json')])
+        if os.path.exists(get_cache_db_path(lang)):
+            cached_count = get_cache_connection(lang).execute('SELECT COUNT(*) FROM cache').fetchone()[0]
         else:
             cached_count = 0
         
@@ -131,18 +271,24 @@ def get_cache_stats():
     
     return stats
 
+def _clear_language(language):
+    """Delete a language's cached rows and any legacy per-text files"""
+    if os.path.exists(get_cache_db_path(language)):
+        conn = get_cache_connection(language)
+        with _write_lock:
+            conn.execute('DELETE FROM cache')
+            conn.commit()
+    lang_dir = os.path.join(CACHE_DIR, language)
+    if os.path.exists(lang_dir):
+        for f in os.listdir(lang_dir):
+            os.remove(os.path.join(lang_dir, f))
+
 def clear_lemma_cache(language=None):
     """Clear lemma cache for a language or all languages"""
     if language:
-        lang_dir = os.path.join(CACHE_DIR, language)
-        if os.path.exists(lang_dir):
-            for f in os.listdir(lang_dir):
-                os.remove(os.path.join(lang_dir, f))
-            return {'cleared': language}
+        _clear_language(language)
+        return {'cleared': language}
     else:
         for lang in ['la', 'grc', 'en']:
-            lang_dir = os.path.join(CACHE_DIR, lang)
-            if os.path.exists(lang_dir):
-                for f in os.listdir(lang_dir):
-                    os.remove(os.path.join(lang_dir, f))
+            _clear_language(lang)
         return {'cleared': 'all'}
@@ -19,24 +19,111 @@ Stoplist Basis Options:
     - target: Use target text frequencies only
     - source_target: Use combined source+target frequencies
 """
+import threading
 import unicodedata
+from functools import lru_cache
 
+# The fold tables cover code points below this bound: Latin, Greek, Greek Extended
+# and the combining-mark blocks, whose decompositions stay below it too. Scanning
+# all of Unicode at import took most of a second in every process
+_FOLD_LIMIT = 0x2100
+
+# Every nonspacing combining mark (category Mn) below _FOLD_LIMIT mapped to None, for str.translate
+_COMBINING_MARKS = dict.fromkeys(
+    cp for cp in range(_FOLD_LIMIT) if unicodedata.category(chr(cp)) == 'Mn'
+)
+_LATIN_UV = str.maketrans('v', 'u')
+
+def _build_greek_fold():
+    """
+    Per-code-point table for NFD + mark stripping + lowercasing in one translate,
+    over the code points below _FOLD_LIMIT. Capital sigma is left out: its
+    lowercase depends on position (σ/ς), so normalize_greek lowercases the rare
+    strings that still contain it.
+    """
+    fold = dict(_COMBINING_MARKS)
+    for cp in range(_FOLD_LIMIT):
+        c = chr(cp)
+        if cp in fold or cp == 0x3A3:
+            continue
+        if c.lower() != c or not unicodedata.is_normalized('NFD', c):
+            stripped = unicodedata.normalize('NFD', c).translate(_COMBINING_MARKS).lower()
+            fold[cp] = stripped or None
+    return fold
+
+_GREEK_FOLD = _build_greek_fold()
+
+@lru_cache(maxsize=200_000)
 def normalize_greek(text):
     """Strip accents/diacritics from Greek text for stoplist comparison"""
-    # NFD decomposes characters, then we filter out combining marks
-    normalized = unicodedata.normalize('NFD', text)
-    return ''.join(c for c in normalized if unicodedata.category(c) != 'Mn').lower()
+    if text and max(text) >= chr(_FOLD_LIMIT):
+        # Outside the fold table: decompose and filter marks character by character
+        normalized = unicodedata.normalize('NFD', text)
+        return ''.join(c for c in normalized if unicodedata.category(c) != 'Mn').lower()
+    # Decompose, drop combining marks and lowercase in one C-level pass
+    folded = text.translate(_GREEK_FOLD)
+    return folded.lower() if 'Σ' in folded else folded
 
+@lru_cache(maxsize=200_000)
 def normalize_latin(text):
     """Normalize Latin text for stoplist comparison (u/v equivalence)"""
     # Classical Latin texts often use 'u' where modern editions use 'v'
-    return text.lower().replace('v', 'u')
+    return text.lower().translate(_LATIN_UV)
 
 from collections import defaultdict, Counter
+import heapq
 import math
+import numpy as np
 from backend.zipf import find_zipf_elbow
 from backend.feature_extractor import feature_extractor
 
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+# Upper bound on uint64 words in one source-block x targets AND, to cap temporaries
+SOUND_BLOCK_WORDS = 1 << 22
+
+# Upper bound on source-block x targets count cells in one find_matches pass
+MATCH_BLOCK_CELLS = 1 << 22
+
+# Stoplists kept per Matcher, oldest dropped first
+STOPLIST_CACHE_SIZE = 32
+
+def stoplist_cache_key(source_id, target_id, language, settings=None):
+    """
+    Stable stoplist cache key for a search between two corpus texts: their ids,
+    unit types and the corpus checksum, so an edited or added text invalidates it.
+    """
+    from backend.frequency_cache import get_corpus_checksum
+    settings = settings or {}
+    return (source_id, target_id, settings.get('source_unit_type', 'line'),
+            settings.get('target_unit_type', 'line'), get_corpus_checksum(language))
+
+def _popcount_rows(bits):
+    """Number of set bits along the last axis of a uint64 array."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(bits).sum(axis=-1, dtype=np.int64)
+    return _POPCOUNT_TABLE[bits.view(np.uint8)].sum(axis=-1, dtype=np.int64)
+
+def _feature_positions(features):
+    """Return (first, last) dicts mapping each feature to its first and last position."""
+    last = {feat: i for i, feat in enumerate(features)}
+    first = {feat: i for i, feat in zip(range(len(features) - 1, -1, -1), reversed(features))}
+    return first, last
+
+def _trigram_bitsets(trigram_sets, vocab):
+    """
+    Encode each trigram set as a row of a packed bitmap over the search vocabulary.
+    Returns a (len(trigram_sets), ceil(len(vocab) / 64)) uint64 array.
+    """
+    width = max((len(vocab) + 63) // 64, 1)
+    words = np.zeros((len(trigram_sets), width), dtype=np.uint64)
+    lengths = [len(trigrams) for trigrams in trigram_sets]
+    ids = np.fromiter((vocab[t] for trigrams in trigram_sets for t in trigrams), dtype=np.uint64, count=sum(lengths))
+    rows = np.repeat(np.arange(len(trigram_sets)), lengths)
+    # Set bits straight into the packed words; no dense N x V bool matrix
+    np.bitwise_or.at(words, (rows, (ids >> np.uint64(6)).astype(np.intp)), np.uint64(1) << (ids & np.uint64(63)))
+    return words
+
 DEFAULT_LATIN_STOP_WORDS_LIST = [
     'et', 'in', 'est', 'non', 'ut', 'cum', 'ad', 'sed', 'si', 'quod',
     'qui', 'quae', 'que', 'de', 'ex', 'per', 'ab', 'ac', 'atque',
@@ -118,17 +205,48 @@ DEFAULT_ENGLISH_STOP_WORDS_LIST = [
     'nor', 'neither', 'either', 'none', 'any', 'many', 'few', 'less', 'least'
 ]
 
-DEFAULT_LATIN_STOP_WORDS = set(DEFAULT_LATIN_STOP_WORDS_LIST)
-DEFAULT_GREEK_STOP_WORDS = set(DEFAULT_GREEK_STOP_WORDS_LIST)
-DEFAULT_ENGLISH_STOP_WORDS = set(DEFAULT_ENGLISH_STOP_WORDS_LIST)
+# Some forms are listed under more than one heading; keep each at its first
+# position so build_stoplist_manual's top-N slices hold N distinct words
+DEFAULT_LATIN_STOP_WORDS_LIST = list(dict.fromkeys(DEFAULT_LATIN_STOP_WORDS_LIST))
+DEFAULT_GREEK_STOP_WORDS_LIST = list(dict.fromkeys(DEFAULT_GREEK_STOP_WORDS_LIST))
+DEFAULT_ENGLISH_STOP_WORDS_LIST = list(dict.fromkeys(DEFAULT_ENGLISH_STOP_WORDS_LIST))
+
+DEFAULT_LATIN_STOP_WORDS = frozenset(DEFAULT_LATIN_STOP_WORDS_LIST)
+DEFAULT_GREEK_STOP_WORDS = frozenset(DEFAULT_GREEK_STOP_WORDS_LIST)
+DEFAULT_ENGLISH_STOP_WORDS = frozenset(DEFAULT_ENGLISH_STOP_WORDS_LIST)
+
+# Default stopwords already normalized the way find_matches compares them
+DEFAULT_LATIN_STOP_WORDS_NORM = frozenset(normalize_latin(w) for w in DEFAULT_LATIN_STOP_WORDS)
+DEFAULT_GREEK_STOP_WORDS_NORM = frozenset(normalize_greek(w) for w in DEFAULT_GREEK_STOP_WORDS)
+DEFAULT_ENGLISH_STOP_WORDS_NORM = frozenset(w.lower() for w in DEFAULT_ENGLISH_STOP_WORDS)
+
+@lru_cache(maxsize=65536)
+def is_default_stopword(word, language):
+    """
+    Check word against the built-in stoplist the way find_matches does: surface
+    form first, then normalized (Greek also without a trailing elision mark).
+    Cached, so a repeat token is a single lookup for normalization and membership.
+    """
+    if language == 'grc':
+        if word in DEFAULT_GREEK_STOP_WORDS:
+            return True
+        normalized = normalize_greek(word)
+        return (normalized in DEFAULT_GREEK_STOP_WORDS_NORM
+                or normalized.rstrip("'᾽'") in DEFAULT_GREEK_STOP_WORDS_NORM)
+    if language == 'la':
+        return word in DEFAULT_LATIN_STOP_WORDS or normalize_latin(word) in DEFAULT_LATIN_STOP_WORDS_NORM
+    return word in DEFAULT_ENGLISH_STOP_WORDS
 
 class Matcher:
     def __init__(self):
         self.synonym_dict = {}
         self.stoplist_cache = {}
+        self._stoplist_lock = threading.Lock()
     
     def load_synonyms(self, filepath):
         """Load synonym dictionary for semantic matching"""
+        with self._stoplist_lock:
+            self.stoplist_cache.clear()
         try:
             with open(filepath, 'r', encoding='utf-8') as f:
                 for line in f:
@@ -140,8 +258,35 @@ class Matcher:
         except FileNotFoundError:
             pass
     
-    def build_stoplist(self, source_units, target_units, stoplist_basis='source_target', language='la', corpus_frequencies=None, match_type='lemma'):
-        """Build stoplist using Zipf elbow detection based on specified text basis"""
+    def _cached_stoplist(self, key):
+        """Return a copy of the stoplist cached under key, or None."""
+        if key is None:
+            return None
+        with self._stoplist_lock:
+            stop_words = self.stoplist_cache.get(key)
+        return set(stop_words) if stop_words is not None else None
+    
+    def _store_stoplist(self, key, stop_words):
+        """Cache a freshly built stoplist under key (None: don't cache)."""
+        if key is None:
+            return stop_words
+        with self._stoplist_lock:
+            if key not in self.stoplist_cache and len(self.stoplist_cache) >= STOPLIST_CACHE_SIZE:
+                self.stoplist_cache.pop(next(iter(self.stoplist_cache)))
+            self.stoplist_cache[key] = frozenset(stop_words)
+        return stop_words
+    
+    def build_stoplist(self, source_units, target_units, stoplist_basis='source_target', language='la', corpus_frequencies=None, match_type='lemma', text_key=None):
+        """
+        Build stoplist using Zipf elbow detection based on specified text basis.
+        Repeat searches reuse the stoplist when the caller passes a text_key
+        (see stoplist_cache_key) identifying the texts and corpus version.
+        """
+        cache_key = ('zipf', stoplist_basis, language, match_type, text_key) if text_key is not None else None
+        cached = self._cached_stoplist(cache_key)
+        if cached is not None:
+            return cached
+        
         # For exact match, use tokens; otherwise use lemmas
         use_tokens = (match_type == 'exact')
         feature_key = 'tokens' if use_tokens else 'lemmas'
@@ -149,21 +294,18 @@ class Matcher:
         if stoplist_basis == 'corpus' and corpus_frequencies and not use_tokens:
             freq = Counter()
             freq.update(corpus_frequencies)
-        elif stoplist_basis == 'source':
-            all_features = []
-            for unit in source_units:
-                all_features.extend(unit.get(feature_key, unit.get('lemmas', [])))
-            freq = Counter(all_features)
-        elif stoplist_basis == 'target':
-            all_features = []
-            for unit in target_units:
-                all_features.extend(unit.get(feature_key, unit.get('lemmas', [])))
-            freq = Counter(all_features)
         else:
-            all_features = []
-            for unit in source_units + target_units:
-                all_features.extend(unit.get(feature_key, unit.get('lemmas', [])))
-            freq = Counter(all_features)
+            if stoplist_basis == 'source':
+                basis_units = [source_units]
+            elif stoplist_basis == 'target':
+                basis_units = [target_units]
+            else:
+                basis_units = [source_units, target_units]
+            # Count each unit's features in place rather than concatenating them first
+            freq = Counter()
+            for units in basis_units:
+                for unit in units:
+                    freq.update(unit.get(feature_key, unit.get('lemmas', [])))
         
         # Exact match on tokens needs more aggressive stoplist since token distributions
         # are more gradual than lemma distributions (accents create variants, and 
@@ -191,26 +333,29 @@ class Matcher:
         else:
             base_stops = DEFAULT_ENGLISH_STOP_WORDS
         
-        return zipf_stops.union(base_stops)
+        return self._store_stoplist(cache_key, zipf_stops.union(base_stops))
     
     def build_stoplist_auto(self, source_units, target_units, language='la'):
         """Build automatic stoplist using Zipf elbow detection (backward compatible)"""
         return self.build_stoplist(source_units, target_units, 'source_target', language)
     
-    def build_stoplist_manual(self, units, stoplist_size=10, language='la', match_type='lemma'):
-        """Build manual stoplist with fixed size"""
+    def build_stoplist_manual(self, units, stoplist_size=10, language='la', match_type='lemma', text_key=None):
+        """Build manual stoplist with fixed size (cached under text_key, as in build_stoplist)"""
         if stoplist_size == 0:
             return set()
         
+        cache_key = ('manual', stoplist_size, language, match_type, text_key) if text_key is not None else None
+        cached = self._cached_stoplist(cache_key)
+        if cached is not None:
+            return cached
+        
         # For exact match, use tokens; otherwise use lemmas
         use_tokens = (match_type == 'exact')
         feature_key = 'tokens' if use_tokens else 'lemmas'
         
-        all_features = []
+        freq = Counter()
         for unit in units:
-            all_features.extend(unit.get(feature_key, unit.get('lemmas', [])))
-        
-        freq = Counter(all_features)
+            freq.update(unit.get(feature_key, unit.get('lemmas', [])))
         
         if language == 'la':
             base_stops = set(DEFAULT_LATIN_STOP_WORDS_LIST[:stoplist_size])
@@ -221,10 +366,10 @@ class Matcher:
         
         top_freq = set(w for w, _ in freq.most_common(stoplist_size))
         
-        return base_stops.union(top_freq)
+        return self._store_stoplist(cache_key, base_stops.union(top_freq))
     
-    def find_matches(self, source_units, target_units, settings=None, corpus_frequencies=None):
-        """Find matching lemmas between source and target texts"""
+    def find_matches(self, source_units, target_units, settings=None, corpus_frequencies=None, text_key=None):
+        """Find matching lemmas between source and target texts (text_key: see build_stoplist)"""
         settings = settings or {}
         min_matches = settings.get('min_matches', 2)
         match_type = settings.get('match_type', 'lemma')
@@ -240,9 +385,9 @@ class Matcher:
         if stoplist_size == -1:
             stop_words = set()
         elif stoplist_size > 0:
-            stop_words = self.build_stoplist_manual(source_units + target_units, stoplist_size, language, match_type)
+            stop_words = self.build_stoplist_manual(source_units + target_units, stoplist_size, language, match_type, text_key)
         else:
-            stop_words = self.build_stoplist(source_units, target_units, stoplist_basis, language, corpus_frequencies, match_type)
+            stop_words = self.build_stoplist(source_units, target_units, stoplist_basis, language, corpus_frequencies, match_type, text_key)
         
         if custom_stopwords:
             custom_list = [w.strip().lower() for w in custom_stopwords.split(',') if w.strip()]
@@ -250,16 +395,25 @@ class Matcher:
         
         # Create normalized stopwords sets for language-specific matching
         if language == 'grc':
-            normalized_stop_words = set(normalize_greek(w) for w in stop_words)
+            normalize, base_stops = normalize_greek, DEFAULT_GREEK_STOP_WORDS
         elif language == 'la':
-            normalized_stop_words = set(normalize_latin(w) for w in stop_words)
+            normalize, base_stops = normalize_latin, DEFAULT_LATIN_STOP_WORDS
+        else:
+            normalize, base_stops = str.lower, DEFAULT_ENGLISH_STOP_WORDS
+        # When the whole built-in list is in play it is checked by the cached
+        # is_default_stopword; only the Zipf/custom extras need normalizing here
+        use_defaults = base_stops <= stop_words
+        if use_defaults:
+            normalized_stop_words = set(normalize(w) for w in stop_words - base_stops)
         else:
-            normalized_stop_words = set(w.lower() for w in stop_words)
+            normalized_stop_words = set(normalize(w) for w in stop_words)
         
         def is_stopword(word):
             """Check if word is a stopword, using language-specific normalization"""
             if word in stop_words:
                 return True
+            if use_defaults and is_default_stopword(word, language):
+                return True
             if language == 'grc':
                 normalized = normalize_greek(word)
                 if normalized in normalized_stop_words:
@@ -274,55 +428,117 @@ class Matcher:
                     return True
             return False
         
-        target_index = defaultdict(list)
-        for i, unit in enumerate(target_units):
-            if match_type == 'exact':
-                features = set(unit['tokens'])
-            else:
-                features = set(unit['lemmas'])
-            
-            for feature in features:
-                if not is_stopword(feature) and len(feature) > 2:
-                    target_index[feature].append(i)
-                    
-                    if match_type == 'syn' and feature in self.synonym_dict:
-                        for syn in self.synonym_dict[feature]:
-                            target_index[syn].append(i)
-        
+        feature_key = 'tokens' if match_type == 'exact' else 'lemmas'
+        
+        # Decide stopword/length once per distinct feature, then filter every unit
+        # once: its distinct content-feature ids serve both the target index and
+        # the source pass below
+        src_sets = [set(unit[feature_key]) for unit in source_units]
+        tgt_sets = [set(unit[feature_key]) for unit in target_units]
+        vocabulary = set().union(*src_sets, *tgt_sets)
+        content_features = {f for f in vocabulary if len(f) > 2 and not is_stopword(f)}
+        
+        feature_list = list(content_features)
+        feature_ids = {f: i for i, f in enumerate(feature_list)}
+        src_ids = [[feature_ids[f] for f in features & content_features] for features in src_sets]
+        tgt_ids = [[feature_ids[f] for f in features & content_features] for features in tgt_sets]
+        del src_sets, tgt_sets
+        
+        # Invert the targets once into CSR postings: the targets holding key id k
+        # are index_targets[index_offsets[k]:index_offsets[k + 1]]
+        pair_keys = [fid for ids in tgt_ids for fid in ids]
+        pair_targets = [i for i, ids in enumerate(tgt_ids) for _ in ids]
+        if match_type == 'syn':
+            for i, ids in enumerate(tgt_ids):
+                for fid in ids:
+                    for syn in self.synonym_dict.get(feature_list[fid], ()):
+                        pair_keys.append(feature_ids.setdefault(syn, len(feature_ids)))
+                        pair_targets.append(i)
+        
+        pair_keys = np.asarray(pair_keys, dtype=np.int64)
+        order = np.argsort(pair_keys, kind='stable')
+        index_targets = np.asarray(pair_targets, dtype=np.int32)[order]
+        index_offsets = np.zeros(len(feature_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pair_keys, minlength=len(feature_ids)), out=index_offsets[1:])
+        
+        if match_type == 'syn':
+            # A source feature hits the targets of its own id and of each synonym;
+            # synonym rows can repeat a target, so merge them into a deduped CSR
+            merged = []
+            for fid, feature in enumerate(feature_list):
+                keys = [fid]
+                if feature in self.synonym_dict:
+                    keys.extend(feature_ids[syn] for syn in self.synonym_dict[feature] if syn in feature_ids)
+                merged.append(np.unique(np.concatenate([index_targets[index_offsets[k]:index_offsets[k + 1]] for k in keys])))
+            index_offsets = np.zeros(len(feature_list) + 1, dtype=np.int64)
+            np.cumsum([len(hits) for hits in merged], out=index_offsets[1:])
+            index_targets = np.concatenate(merged) if merged else index_targets[:0]
+        
+        posting_lengths = np.diff(index_offsets[:len(feature_list) + 1])
+        
+        # Shared-feature counts for a block of sources against every target:
+        # the source x target product of the unit/feature incidence matrices
+        n_targets = len(target_units)
+        block_size = max(1, MATCH_BLOCK_CELLS // max(n_targets, 1))
         matches = []
         
-        for src_idx, src_unit in enumerate(source_units):
-            if match_type == 'exact':
-                src_features = set(f for f in src_unit['tokens'] 
-                                  if not is_stopword(f) and len(f) > 2)
-            else:
-                src_features = set(f for f in src_unit['lemmas'] 
-                                  if not is_stopword(f) and len(f) > 2)
+        # First/last feature positions per unit. A unit's first surviving pair is
+        # measured with a scan; the table is only built once the unit recurs
+        src_positions = {}
+        tgt_positions = {}
+        
+        def feature_span(unit_positions, idx, unit, matched_features):
+            positions = unit_positions.get(idx)
+            if positions is None:
+                unit_positions[idx] = False
+                return self._get_feature_span(unit, matched_features, match_type)
+            if positions is False:
+                positions = unit_positions[idx] = _feature_positions(unit[feature_key])
+            return self._get_feature_span(unit, matched_features, match_type, positions)
+        
+        for block_start in range(0, len(source_units), block_size):
+            block_units = source_units[block_start:block_start + block_size]
+            block_ids = src_ids[block_start:block_start + block_size]
+            fids = np.fromiter((fid for ids in block_ids for fid in ids), dtype=np.int64)
+            rows = np.repeat(np.arange(len(block_ids), dtype=np.int64), [len(ids) for ids in block_ids])
             
-            target_matches = defaultdict(set)
+            # Gather every posting of every (row, feature) pair in one pass
+            lengths = posting_lengths[fids]
+            total = int(lengths.sum())
+            if not total:
+                continue
+            shift = np.repeat(index_offsets[fids] - (np.cumsum(lengths) - lengths), lengths)
+            cells = index_targets[np.arange(total) + shift] + np.repeat(rows * n_targets, lengths)
             
-            for feature in src_features:
-                if feature in target_index:
-                    for tgt_idx in target_index[feature]:
-                        target_matches[tgt_idx].add(feature)
-                
-                if match_type == 'syn' and feature in self.synonym_dict:
-                    for syn in self.synonym_dict[feature]:
-                        if syn in target_index:
-                            for tgt_idx in target_index[syn]:
-                                target_matches[tgt_idx].add(feature)
+            counts = np.bincount(cells, minlength=len(block_units) * n_targets)
+            
+            # Keep the postings that landed on a surviving pair and group their
+            # feature ids by pair, so matched features come from one sort
+            keep = (counts >= max(min_matches, 1))[cells]
+            hit_cells = cells[keep]
+            if not len(hit_cells):
+                continue
+            hit_fids = np.repeat(fids, lengths)[keep]
+            order = np.argsort(hit_cells, kind='stable')
+            hit_cells = hit_cells[order]
+            hit_fids = hit_fids[order]
+            starts = np.flatnonzero(np.diff(hit_cells)) + 1
             
-            for tgt_idx, matched_features in target_matches.items():
-                if len(matched_features) >= min_matches:
-                    src_distance = self._get_feature_span(src_unit, matched_features, match_type)
-                    tgt_distance = self._get_feature_span(target_units[tgt_idx], matched_features, match_type)
-                    
-                    if src_distance <= max_distance and tgt_distance <= max_distance:
-                        matches.append({
-                            'source_idx': src_idx,
-                            'target_idx': tgt_idx,
-                            'matched_lemmas': list(matched_features)
-                        })
+            for cell, group in zip(hit_cells[np.r_[0, starts]].tolist(), np.split(hit_fids, starts)):
+                row, tgt_idx = divmod(cell, n_targets)
+                src_unit = block_units[row]
+                matched_features = {feature_list[fid] for fid in group.tolist()}
+                
+                src_idx = block_start + row
+                src_distance = feature_span(src_positions, src_idx, src_unit, matched_features)
+                tgt_distance = feature_span(tgt_positions, tgt_idx, target_units[tgt_idx], matched_features)
+                
+                if src_distance <= max_distance and tgt_distance <= max_distance:
+                    matches.append({
+                        'source_idx': src_idx,
+                        'target_idx': tgt_idx,
+                        'matched_lemmas': tuple(matched_features)
+                    })
         
         return matches, len(stop_words)
     
@@ -333,7 +549,7 @@ class Matcher:
         rhyme, assonance, and other phonetic patterns.
         
         Performance safeguards:
-        - Pre-computes trigram sets for all units
+        - Pre-computes trigram sets (and trigram -> token positions) for all units
         - Uses similarity floor to skip low-quality pairs early
         - Per-source top-N targeting ensures coverage across all source units
         - Returns top N results by score
@@ -344,20 +560,36 @@ class Matcher:
         top_n_per_source = settings.get('sound_top_n', 10)
         
         src_trigram_cache = []
+        src_trigram_index = []
         for src_unit in source_units:
             src_tokens = [t for t in src_unit.get('tokens', []) if len(t) >= 3]
-            src_trigrams = set()
-            for token in src_tokens:
-                src_trigrams.update(feature_extractor.get_trigrams(token))
-            src_trigram_cache.append((src_tokens, src_trigrams))
+            trigram_index = feature_extractor.get_unit_trigrams(src_tokens)
+            src_trigram_cache.append((src_tokens, set(trigram_index)))
+            src_trigram_index.append(trigram_index)
         
         tgt_trigram_cache = []
+        tgt_trigram_index = []
         for tgt_unit in target_units:
             tgt_tokens = [t for t in tgt_unit.get('tokens', []) if len(t) >= 3]
-            tgt_trigrams = set()
-            for token in tgt_tokens:
-                tgt_trigrams.update(feature_extractor.get_trigrams(token))
-            tgt_trigram_cache.append((tgt_tokens, tgt_trigrams))
+            trigram_index = feature_extractor.get_unit_trigrams(tgt_tokens)
+            tgt_trigram_cache.append((tgt_tokens, set(trigram_index)))
+            tgt_trigram_index.append(trigram_index)
+        
+        # Specialize to this search's trigram vocabulary: each unit becomes a bitmap,
+        # so Jaccard against all targets is AND + popcount over uint64 words
+        vocab = {}
+        for _, trigrams in src_trigram_cache + tgt_trigram_cache:
+            for trigram in trigrams:
+                vocab.setdefault(trigram, len(vocab))
+        src_bits = _trigram_bitsets([trigrams for _, trigrams in src_trigram_cache], vocab)
+        tgt_bits = _trigram_bitsets([trigrams for _, trigrams in tgt_trigram_cache], vocab)
+        src_sizes = np.array([len(trigrams) for _, trigrams in src_trigram_cache], dtype=np.int64)
+        tgt_sizes = np.array([len(trigrams) for _, trigrams in tgt_trigram_cache], dtype=np.int64)
+        
+        # Score a block of sources against every target per NumPy call
+        block_size = max(1, SOUND_BLOCK_WORDS // max(tgt_bits.size, 1))
+        block_start = 0
+        similarity_block = None
         
         matches = []
         
@@ -365,60 +597,84 @@ class Matcher:
             if not src_trigrams:
                 continue
             
-            src_candidates = []
-            for tgt_idx, (tgt_tokens, tgt_trigrams) in enumerate(tgt_trigram_cache):
-                if not tgt_trigrams:
-                    continue
+            if similarity_block is None or src_idx >= block_start + len(similarity_block):
+                block_start = src_idx
+                block_bits = src_bits[block_start:block_start + block_size]
+                block_sizes = src_sizes[block_start:block_start + block_size, None]
                 
-                intersection = len(src_trigrams & tgt_trigrams)
-                union = len(src_trigrams | tgt_trigrams)
-                unit_similarity = intersection / union if union > 0 else 0
+                # Jaccard can't exceed min(|S|,|T|) / max(|S|,|T|), so pairs whose sizes
+                # are too far apart are ruled out before any popcount; pruned pairs get -1
+                size_bound = np.minimum(block_sizes, tgt_sizes) / np.maximum(np.maximum(block_sizes, tgt_sizes), 1)
+                possible = (size_bound >= min_sound_score) & (tgt_sizes > 0)
+                cols = np.flatnonzero(possible.any(axis=0))
                 
-                if unit_similarity >= min_sound_score:
-                    src_candidates.append((tgt_idx, tgt_tokens, unit_similarity))
+                similarity_block = np.full(possible.shape, -1.0)
+                if len(cols):
+                    intersection = _popcount_rows(block_bits[:, None, :] & tgt_bits[None, cols, :])
+                    union = block_sizes + tgt_sizes[cols] - intersection
+                    similarity_block[:, cols] = np.where(
+                        possible[:, cols], intersection / np.maximum(union, 1), -1.0
+                    )
             
-            src_candidates.sort(key=lambda x: x[2], reverse=True)
-            for tgt_idx, tgt_tokens, unit_similarity in src_candidates[:top_n_per_source]:
-                tgt_trigrams = tgt_trigram_cache[tgt_idx][1]
-                shared_trigrams = list(src_trigrams & tgt_trigrams)
-                shared_trigrams.sort(key=lambda t: sum(1 for tok in src_tokens + tgt_tokens if t in tok.lower()), reverse=True)
-                top_trigrams = shared_trigrams[:10]
-                
-                trigram_tokens = {}
-                for tri in top_trigrams:
-                    src_toks = [t for t in src_tokens if tri in t.lower()]
-                    tgt_toks = [t for t in tgt_tokens if tri in t.lower()]
-                    if src_toks and tgt_toks:
-                        for st in src_toks[:2]:
-                            for tt in tgt_toks[:2]:
-                                if st.lower() != tt.lower():
-                                    trigram_tokens[tri] = (st, tt)
-                                    break
-                            if tri in trigram_tokens:
-                                break
-                
+            similarities = similarity_block[src_idx - block_start]
+            candidate_idx = np.flatnonzero((similarities >= min_sound_score) & (tgt_sizes > 0))
+            
+            src_candidates = list(zip(candidate_idx.tolist(), similarities[candidate_idx].tolist()))
+            
+            for tgt_idx, unit_similarity in heapq.nlargest(top_n_per_source, src_candidates, key=lambda x: x[1]):
                 matches.append({
                     'source_idx': src_idx,
                     'target_idx': tgt_idx,
-                    'matched_lemmas': [],
+                    'matched_lemmas': (),
                     'match_basis': 'sound',
-                    'sound_score': unit_similarity,
-                    'shared_trigrams': top_trigrams,
-                    'trigram_tokens': trigram_tokens
+                    'sound_score': unit_similarity
                 })
         
-        matches.sort(key=lambda x: x.get('sound_score', 0), reverse=True)
-        
         if max_results > 0:
-            matches = matches[:max_results]
+            matches = heapq.nlargest(max_results, matches, key=lambda x: x.get('sound_score', 0))
+        else:
+            matches.sort(key=lambda x: x.get('sound_score', 0), reverse=True)
+        
+        # Trigram evidence is only worked out for the matches that are returned
+        for match in matches:
+            src_idx, tgt_idx = match['source_idx'], match['target_idx']
+            match['shared_trigrams'], match['trigram_tokens'] = self._sound_match_evidence(
+                src_trigram_cache[src_idx][0], src_trigram_index[src_idx],
+                tgt_trigram_cache[tgt_idx][0], tgt_trigram_index[tgt_idx]
+            )
         
         return matches, 0
     
+    def _sound_match_evidence(self, src_tokens, src_index, tgt_tokens, tgt_index):
+        """
+        Pick the top shared trigrams for a sound match and an example
+        (source token, target token) pair for each. The indexes map each
+        trigram to the positions of the tokens containing it.
+        """
+        shared_trigrams = [t for t in src_index if t in tgt_index]
+        shared_trigrams.sort(key=lambda t: len(src_index[t]) + len(tgt_index[t]), reverse=True)
+        top_trigrams = shared_trigrams[:10]
+        
+        trigram_tokens = {}
+        for tri in top_trigrams:
+            src_toks = [src_tokens[i] for i in src_index[tri][:2]]
+            tgt_toks = [tgt_tokens[i] for i in tgt_index[tri][:2]]
+            for st in src_toks:
+                for tt in tgt_toks:
+                    if st.lower() != tt.lower():
+                        trigram_tokens[tri] = (st, tt)
+                        break
+                if tri in trigram_tokens:
+                    break
+        
+        return top_trigrams, trigram_tokens
+    
     def find_edit_distance_matches(self, source_units, target_units, settings=None):
         """
         Find matches based on edit distance (fuzzy string matching).
         Like Filum from QCL: finds phrases with multiple fuzzy word matches.
-        Uses trigram-based candidate filtering to avoid O(n²) full comparison.
+        Fuzzy-matches the token vocabularies once, then only compares unit pairs
+        with enough partnered tokens, avoiding the O(n²) full comparison.
         Requires min_matches (default 2) fuzzy word pairs per match.
         """
         import time
@@ -437,46 +693,46 @@ class Matcher:
         print(f"[EDIT_DISTANCE] source_units={num_source}, target_units={num_target}")
         print(f"[EDIT_DISTANCE] stoplist_size={stoplist_size}")
         
+        # Pre-process: (token, normalized form) for each unit's tokens, computed once
+        # and shared by the stoplist count and the stopword filter below
+        src_normalized = [[(t, normalize_greek(t)) for t in unit.get('tokens', []) if len(t) >= 3]
+                          for unit in source_units]
+        tgt_normalized = [[(t, normalize_greek(t)) for t in unit.get('tokens', []) if len(t) >= 3]
+                          for unit in target_units]
+        
         # Build stoplist from token frequencies if stoplist_size > 0
         stop_words = set()
         if stoplist_size > 0:
             token_freq = Counter()
-            for unit in source_units:
-                for token in unit.get('tokens', []):
-                    if len(token) >= 3:
-                        token_freq[normalize_greek(token)] += 1
-            for unit in target_units:
-                for token in unit.get('tokens', []):
-                    if len(token) >= 3:
-                        token_freq[normalize_greek(token)] += 1
+            for tokens in src_normalized + tgt_normalized:
+                token_freq.update(norm for _, norm in tokens)
             
             most_common = token_freq.most_common(stoplist_size)
             stop_words = set(word for word, count in most_common)
             print(f"[EDIT_DISTANCE] Built stoplist with {len(stop_words)} words")
         
-        # Pre-process: extract tokens for each unit
-        src_token_lists = []
-        for unit in source_units:
-            tokens = [t for t in unit.get('tokens', []) 
-                     if len(t) >= 3 and normalize_greek(t) not in stop_words]
-            src_token_lists.append(tokens)
-        
-        tgt_token_lists = []
-        for unit in target_units:
-            tokens = [t for t in unit.get('tokens', []) 
-                     if len(t) >= 3 and normalize_greek(t) not in stop_words]
-            tgt_token_lists.append(tokens)
-        
-        # Build trigram index for target tokens → target unit indices
-        # This allows O(1) lookup of candidate lines sharing similar trigrams
-        # Uses feature_extractor's existing get_trigrams method
-        trigram_to_targets = defaultdict(set)
+        src_token_lists = [[t for t, norm in tokens if norm not in stop_words] for tokens in src_normalized]
+        tgt_token_lists = [[t for t, norm in tokens if norm not in stop_words] for tokens in tgt_normalized]
+        
+        # Fuzzy-match the distinct token vocabularies once and index target units by
+        # token; a target unit can only yield min_matches pairs if at least that many
+        # distinct source tokens have a fuzzy partner in it
+        threshold = int(min_similarity * 100)
+        token_partners = feature_extractor.find_fuzzy_token_pairs(
+            sorted({t for tokens in src_token_lists for t in tokens}),
+            sorted({t for tokens in tgt_token_lists for t in tokens}),
+            threshold=threshold
+        )
+        token_to_targets = defaultdict(set)
+        tgt_trigrams = []
         for tgt_idx, tgt_tokens in enumerate(tgt_token_lists):
+            unit_trigrams = set()
             for token in tgt_tokens:
-                for trigram in feature_extractor.get_trigrams(token):
-                    trigram_to_targets[trigram].add(tgt_idx)
+                token_to_targets[token].add(tgt_idx)
+                unit_trigrams.update(feature_extractor.get_trigrams(token))
+            tgt_trigrams.append(unit_trigrams)
         
-        print(f"[EDIT_DISTANCE] Built trigram index with {len(trigram_to_targets)} unique trigrams")
+        print(f"[EDIT_DISTANCE] Found {sum(len(p) for p in token_partners.values())} fuzzy token pairs")
         
         matches = []
         start_time = time.time()
@@ -493,17 +749,24 @@ class Matcher:
                 print(f"[EDIT_DISTANCE] Progress: {progress}% ({src_idx}/{num_source}) - {elapsed:.1f}s, {comparisons_made:,} comparisons")
                 last_progress = progress
             
-            # Find candidate targets that share trigrams with source tokens
+            # Count, per target unit, the distinct source tokens with a partner in it
             candidate_targets = Counter()
-            for token in src_tokens:
-                for trigram in feature_extractor.get_trigrams(token):
-                    for tgt_idx in trigram_to_targets.get(trigram, []):
-                        candidate_targets[tgt_idx] += 1
+            for token in set(src_tokens):
+                partner_targets = set()
+                for partner in token_partners.get(token, ()):
+                    partner_targets.update(token_to_targets[partner])
+                candidate_targets.update(partner_targets)
+            
+            required = max(min_matches, 1)
+            filtered_candidates = sorted(tgt_idx for tgt_idx, count in candidate_targets.items()
+                                         if count >= required)
             
-            # Only compare with targets that share at least 2 trigrams (rough filter)
+            # Keep the rough filter: at least 2 source-trigram hits on the target unit
+            src_trigrams = [feature_extractor.get_trigrams(token) for token in src_tokens]
             min_shared_trigrams = 2
-            filtered_candidates = [tgt_idx for tgt_idx, count in candidate_targets.items() 
-                                  if count >= min_shared_trigrams]
+            filtered_candidates = [tgt_idx for tgt_idx in filtered_candidates
+                                   if sum(len(trigrams & tgt_trigrams[tgt_idx]) for trigrams in src_trigrams)
+                                   >= min_shared_trigrams]
             
             src_candidates = []
             for tgt_idx in filtered_candidates:
@@ -513,24 +776,28 @@ class Matcher:
                 
                 comparisons_made += 1
                 
-                fuzzy_matches = feature_extractor.find_fuzzy_matches(
-                    src_tokens, tgt_tokens, threshold=int(min_similarity * 100)
+                # Keep matches as a compact array; dicts are only built for kept candidates.
+                # Similarities come from the vocabulary pass, so no token pair is rescored
+                fuzzy_matches = feature_extractor.lookup_fuzzy_match_array(
+                    src_tokens, tgt_tokens, token_partners
                 )
+                if not len(fuzzy_matches):
+                    continue
                 
-                unique_src = set(m['source_token'] for m in fuzzy_matches)
-                unique_tgt = set(m['target_token'] for m in fuzzy_matches)
+                unique_src = set(src_tokens[i] for i in fuzzy_matches['src'].tolist())
+                unique_tgt = set(tgt_tokens[i] for i in fuzzy_matches['tgt'].tolist())
                 num_unique_pairs = min(len(unique_src), len(unique_tgt))
                 
                 if num_unique_pairs >= min_matches:
-                    avg_sim = sum(m['similarity'] for m in fuzzy_matches) / len(fuzzy_matches)
+                    avg_sim = float(fuzzy_matches['sim'].mean())
                     src_candidates.append((tgt_idx, tgt_tokens, fuzzy_matches, avg_sim, num_unique_pairs))
             
-            src_candidates.sort(key=lambda x: (x[4], x[3]), reverse=True)
-            for tgt_idx, tgt_tokens, fuzzy_matches, avg_sim, num_pairs in src_candidates[:top_n_per_source]:
+            for tgt_idx, tgt_tokens, fuzzy_matches, avg_sim, num_pairs in heapq.nlargest(
+                    top_n_per_source, src_candidates, key=lambda x: (x[4], x[3])):
                 matches.append({
                     'source_idx': src_idx,
                     'target_idx': tgt_idx,
-                    'matched_lemmas': [],
+                    'matched_lemmas': (),
                     'match_basis': 'edit_distance',
                     'edit_score': avg_sim,
                     'num_matches': num_pairs,
@@ -540,27 +807,40 @@ class Matcher:
         elapsed = time.time() - start_time
         print(f"[EDIT_DISTANCE] Complete: {comparisons_made:,} comparisons in {elapsed:.1f}s (vs {num_source * num_target:,} full)")
         
-        matches.sort(key=lambda x: (x.get('num_matches', 0), x.get('edit_score', 0)), reverse=True)
-        
+        edit_key = lambda x: (x.get('num_matches', 0), x.get('edit_score', 0))
         if max_results > 0:
-            matches = matches[:max_results]
+            matches = heapq.nlargest(max_results, matches, key=edit_key)
+        else:
+            matches.sort(key=edit_key, reverse=True)
+        
+        # Token-pair dicts are only built for the matches that are returned
+        for match in matches:
+            match['fuzzy_matches'] = feature_extractor.fuzzy_match_dicts(
+                match['fuzzy_matches'], src_token_lists[match['source_idx']], tgt_token_lists[match['target_idx']]
+            )
         
         return matches, len(stop_words)
     
-    def _get_feature_span(self, unit, matched_features, match_type):
-        """Get the minimal span covering all matched features in a unit (V3-style)"""
+    def _get_feature_span(self, unit, matched_features, match_type, positions=None):
+        """
+        Get the minimal span covering all matched features in a unit (V3-style).
+        positions is the unit's _feature_positions, when the caller has it.
+        """
+        if positions is not None:
+            first, last = positions
+            firsts = [first[f] for f in matched_features if f in first]
+            if not firsts:
+                return 1
+            return max(max(last[f] for f in matched_features if f in last) - min(firsts), 1)
+        
         if match_type == 'exact':
             features = unit['tokens']
         else:
             features = unit['lemmas']
         
-        positions = []
-        for i, feat in enumerate(features):
-            if feat in matched_features:
-                positions.append(i)
-        
-        if len(positions) < 2:
+        # Only the outermost matches matter: scan in from each end and stop at the first hit
+        first = next((i for i, feat in enumerate(features) if feat in matched_features), None)
+        if first is None:
             return 1
-        
-        span = max(positions) - min(positions)
-        return max(span, 1)
+        last = len(features) - 1 - next(i for i, feat in enumerate(reversed(features)) if feat in matched_features)
+        return max(last - first, 1)
@@ -13,9 +13,36 @@ MQDQ Credits:
 - Pede Certo (https://www.pedecerto.eu) - University of Udine
 - Licensed under CC-BY-NC-ND 4.0
 """
+import itertools
 import json
+import operator
 import os
 import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    from backend.logging_config import get_logger
+except ImportError:
+    from logging_config import get_logger
+
+logger = get_logger('metrical_scanner')
+
+# orjson is optional - it parses the multi-MB MQDQ scansion database several times faster
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# pyahocorasick is optional - one automaton pass replaces a substring test per work marker
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
 # CLTK is optional - only used as fallback when MQDQ scansions are not available
 _CLTK_AVAILABLE = False
@@ -35,22 +62,173 @@ _hexameter_scanner = None
 _hendecasyllable_scanner = None
 _pentameter_scanner = None
 _mqdq_scansions = None
+_cltk_prescan = None
+
+SCANSION_DIR = os.path.join(os.path.dirname(__file__), '..', 'data', 'scansion')
+CLTK_PRESCAN_FILE = 'cltk_prescan.json'
+
+def _load_scansion_json(filename):
+    """Parse a JSON file from the scansion data directory, or return None if it is missing"""
+    path = os.path.join(SCANSION_DIR, filename)
+    if not os.path.exists(path):
+        return None
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+MQDQ_JSON_FILE = 'mqdq_scansions.json'
+MQDQ_DB_FILE = 'mqdq_scansions.db'
+
+# Read-only lookups: mmap lets every worker process share the table's pages
+# through the OS page cache instead of holding its own parsed copy
+MQDQ_DB_PRAGMAS = (
+    'PRAGMA query_only=ON',
+    'PRAGMA mmap_size=268435456',
+)
+
+_mqdq_local = threading.local()
+_mqdq_db_path = None
+
+# In-memory fallback when the SQLite table cannot be written: "work|line_ref" -> row in these lists
+_mqdq_index = {}
+_mqdq_meters = []
+_mqdq_patterns = []
+_mqdq_raw_scansions = []
+
+def _iter_mqdq_lines(raw_scansions):
+    """
+    Flatten the nested {work: {'lines': {line_ref: line_data}}} database into
+    ("work|line_ref", meter, pattern, scansion) rows with lowercased work keys.
+    """
+    for work_key, work_data in raw_scansions.items():
+        work_key = work_key.lower()
+        for line_ref, line_data in work_data.get('lines', {}).items():
+            yield (
+                f"{work_key}|{line_ref}",
+                line_data.get('meter', ''),
+                line_data.get('pattern', ''),
+                line_data.get('scansion', ''),
+            )
+
+def _index_mqdq_scansions(raw_scansions):
+    """
+    Load the MQDQ lines into the in-memory parallel meter/pattern/scansion lists.
+    The first entry wins if two work keys differ only by case.
+    """
+    global _mqdq_index, _mqdq_meters, _mqdq_patterns, _mqdq_raw_scansions
+    index = {}
+    meters = []
+    patterns = []
+    raw = []
+    for key, meter, pattern, scansion in _iter_mqdq_lines(raw_scansions):
+        if key in index:
+            continue
+        index[key] = len(meters)
+        meters.append(meter)
+        patterns.append(pattern)
+        raw.append(scansion)
+    _mqdq_index, _mqdq_meters, _mqdq_patterns, _mqdq_raw_scansions = index, meters, patterns, raw
+    return _lookup_mqdq_memory
+
+def _lookup_mqdq_memory(key):
+    """(meter, pattern, scansion) for a "work|line_ref" key from the in-memory lists, or None"""
+    row = _mqdq_index.get(key)
+    if row is None:
+        return None
+    return _mqdq_meters[row], _mqdq_patterns[row], _mqdq_raw_scansions[row]
+
+def _build_mqdq_db(raw_scansions, db_path):
+    """Write the MQDQ lines to a SQLite table, replacing db_path atomically"""
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.execute('''
+            CREATE TABLE lines (
+                key TEXT PRIMARY KEY,
+                meter TEXT,
+                pattern TEXT,
+                scansion TEXT
+            ) WITHOUT ROWID
+        ''')
+        # First entry wins if two work keys differ only by case
+        conn.executemany('INSERT OR IGNORE INTO lines VALUES (?, ?, ?, ?)', _iter_mqdq_lines(raw_scansions))
+        conn.commit()
+        conn.close()
+        os.replace(tmp_path, db_path)
+    except Exception:
+        conn.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _mqdq_connection():
+    """Per-thread read-only connection to the MQDQ SQLite table"""
+    conn = getattr(_mqdq_local, 'conn', None)
+    if conn is None or getattr(_mqdq_local, 'path', None) != _mqdq_db_path:
+        conn = sqlite3.connect(f"file:{_mqdq_db_path}?mode=ro", uri=True, check_same_thread=False)
+        for pragma in MQDQ_DB_PRAGMAS:
+            conn.execute(pragma)
+        _mqdq_local.conn = conn
+        _mqdq_local.path = _mqdq_db_path
+    return conn
+
+def _lookup_mqdq_db(key):
+    """(meter, pattern, scansion) for a "work|line_ref" key from the SQLite table, or None"""
+    try:
+        return _mqdq_connection().execute(
+            'SELECT meter, pattern, scansion FROM lines WHERE key = ?', (key,)
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"MQDQ scansion lookup failed: {e}")
+        return None
 
 def get_mqdq_scansions():
-    """Load pre-computed MQDQ scansion database"""
-    global _mqdq_scansions
+    """
+    Load pre-computed MQDQ scansion database.
+    Returns a "work|line_ref" -> (meter, pattern, scansion) lookup function, or None if unavailable.
+    The JSON is converted once to a SQLite table (rebuilt when the JSON is newer) that worker
+    processes share; if that cannot be written the lines are held in memory instead.
+    """
+    global _mqdq_scansions, _mqdq_db_path
     if _mqdq_scansions is None:
-        scansion_path = os.path.join(os.path.dirname(__file__), '..', 'data', 'scansion', 'mqdq_scansions.json')
-        if os.path.exists(scansion_path):
-            try:
-                with open(scansion_path, 'r', encoding='utf-8') as f:
-                    _mqdq_scansions = json.load(f)
-            except Exception as e:
-                print(f"Error loading MQDQ scansions: {e}")
-                _mqdq_scansions = {}
-        else:
-            _mqdq_scansions = {}
-    return _mqdq_scansions
+        json_path = os.path.join(SCANSION_DIR, MQDQ_JSON_FILE)
+        db_path = os.path.join(SCANSION_DIR, MQDQ_DB_FILE)
+        try:
+            db_fresh = os.path.exists(db_path) and (
+                not os.path.exists(json_path) or os.path.getmtime(db_path) >= os.path.getmtime(json_path)
+            )
+            if not db_fresh:
+                raw_scansions = _load_scansion_json(MQDQ_JSON_FILE)
+                if not raw_scansions:
+                    _mqdq_scansions = False
+                    return None
+                try:
+                    _build_mqdq_db(raw_scansions, db_path)
+                except (OSError, sqlite3.Error) as e:
+                    logger.warning(f"Could not write {db_path}, keeping MQDQ scansions in memory: {e}")
+                    _mqdq_scansions = _index_mqdq_scansions(raw_scansions)
+                    return _mqdq_scansions
+            _mqdq_db_path = db_path
+            _mqdq_scansions = _lookup_mqdq_db
+        except Exception as e:
+            logger.warning(f"Error loading MQDQ scansions: {e}")
+            _mqdq_scansions = False
+    return _mqdq_scansions or None
+
+def get_cltk_prescan():
+    """Load CLTK verse scans precomputed by scripts/prescan_verses.py: {meter_type: {verse text: result}}"""
+    global _cltk_prescan
+    if _cltk_prescan is None:
+        try:
+            _cltk_prescan = _load_scansion_json(CLTK_PRESCAN_FILE) or {}
+        except Exception as e:
+            logger.warning(f"Error loading CLTK prescan: {e}")
+            _cltk_prescan = {}
+    return _cltk_prescan
 
 TESS_TO_MQDQ_MAP = {
     'verg': 'vergilius',
@@ -188,6 +366,18 @@ TESS_WORK_TO_MQDQ = {
     'elegies': 'elegiae',
 }
 
+# Work abbreviation lengths, longest first, for longest-prefix lookups
+_TESS_WORK_PREFIX_LENGTHS = sorted({len(tess_work) for tess_work in TESS_WORK_TO_MQDQ}, reverse=True)
+
+def _match_tess_work(work_short):
+    """Map a tess work name to its MQDQ work via the longest matching TESS_WORK_TO_MQDQ prefix."""
+    for length in _TESS_WORK_PREFIX_LENGTHS:
+        if length <= len(work_short):
+            mqdq_work = TESS_WORK_TO_MQDQ.get(work_short[:length])
+            if mqdq_work:
+                return mqdq_work
+    return None
+
 ELEGIAC_BOOK_WORKS = {
     'am': 'amores',
     'amores': 'amores',
@@ -204,6 +394,23 @@ BOOK_SPECIFIC_WORKS = {
     'siluae': 'siluae',
 }
 
+# MQDQ pattern code -> scansion marks
+MQDQ_PATTERN_MARKS = {
+    'D': '–∪∪',
+    'S': '––',
+    '-': '–',
+    '=': '–',
+    '|': '|',  # Keep caesura marker
+    'U': '∪',
+    'u': '∪',
+    'X': '×',  # Anceps
+    'x': '×',
+}
+
+# 256-entry translate table: codes expand, every other ASCII character is dropped
+_MQDQ_PATTERN_TABLE = {code: None for code in range(256)}
+_MQDQ_PATTERN_TABLE.update(str.maketrans(MQDQ_PATTERN_MARKS))
+
 def expand_mqdq_pattern(pattern, meter_code):
     """
     Expand MQDQ shorthand pattern codes to full scansion marks.
@@ -223,22 +430,16 @@ def expand_mqdq_pattern(pattern, meter_code):
     """
     if not pattern:
         return None
+    if meter_code == 'H':
+        expanded = _HEXAMETER_EXPANSIONS.get(pattern)
+        if expanded:
+            return expanded
     
-    expanded = ''
-    for char in pattern:
-        if char == 'D':
-            expanded += '–∪∪'
-        elif char == 'S':
-            expanded += '––'
-        elif char == '-' or char == '=':
-            expanded += '–'
-        elif char == '|':
-            expanded += '|'  # Keep caesura marker
-        elif char == 'U' or char == 'u':
-            expanded += '∪'
-        elif char == 'X' or char == 'x':
-            expanded += '×'  # Anceps
-        # Ignore other characters
+    # Other characters are ignored
+    if pattern.isascii():
+        expanded = pattern.translate(_MQDQ_PATTERN_TABLE)
+    else:
+        expanded = ''.join([MQDQ_PATTERN_MARKS[char] for char in pattern if char in MQDQ_PATTERN_MARKS])
     
     # For hexameters, MQDQ patterns only encode feet 1-4
     # Add the 5th foot (dactyl –∪∪) and 6th foot (–×) to complete the adonic ending
@@ -255,6 +456,14 @@ def expand_mqdq_pattern(pattern, meter_code):
     
     return expanded
 
+# Hexameter codes are nearly always four D/S feet: precompute all 16 expansions
+# (filled through expand_mqdq_pattern itself, which consults the table first)
+_HEXAMETER_EXPANSIONS = {}
+_HEXAMETER_EXPANSIONS.update(
+    (code, expand_mqdq_pattern(code, 'H'))
+    for code in map(''.join, itertools.product('DS', repeat=4))
+)
+
 def lookup_mqdq_scansion(locus):
     """
     Look up a scansion from the MQDQ database.
@@ -263,219 +472,143 @@ def lookup_mqdq_scansion(locus):
     And elegiac works with book-specific MQDQ keys: "ov. am. 1.1.1" -> ouidius.amores_1
     Returns scansion dict or None if not found.
     """
+    result = _lookup_mqdq_cached(locus)
+    return result.to_dict() if result else None
+
+@dataclass(frozen=True, slots=True)
+class MqdqScansion:
+    """Immutable MQDQ scansion as held in the lookup cache; callers receive to_dict() copies"""
+    pattern: str
+    raw: str
+    meter: str
+    valid: bool = True
+    source: str = 'mqdq'
+    
+    def to_dict(self) -> dict:
+        return {
+            'pattern': self.pattern,
+            'raw': self.raw,
+            'valid': self.valid,
+            'meter': self.meter,
+            'source': self.source
+        }
+
+@lru_cache(maxsize=4096)
+def _shared_mqdq_scansion(pattern, raw, meter):
+    """One MqdqScansion per distinct (pattern, raw, meter), shared by every cached locus that has it"""
+    return MqdqScansion(pattern, raw, meter)
+
+@lru_cache(maxsize=1024)
+def _expand_for_display(pattern_code, meter_code):
+    """
+    Expand an MQDQ pattern code into its (display pattern, spaced scansion) strings, or None.
+    Only a few dozen distinct codes occur, so every line sharing one reuses the same strings.
+    """
+    expanded = expand_mqdq_pattern(pattern_code, meter_code)
+    if not expanded:
+        return None
+    display_pattern = expanded.replace('|', '')
+    return display_pattern, ' '.join(display_pattern)
+
+def _build_mqdq_result(line, meter_names, default_meter, raw_meter_names=None):
+    """
+    Build an MqdqScansion from an MQDQ (meter, pattern, scansion) line, or None if it has no usable scansion.
+    meter_names maps MQDQ meter codes to meter names; other codes get default_meter.
+    raw_meter_names, if given, replaces meter_names when falling back to the stored scansion.
+    """
+    if line is None:
+        return None
+    meter_code, pattern_code, raw_scansion = line
+    
+    # Prefer expanding pattern code over using truncated scansion
+    display = _expand_for_display(pattern_code, meter_code) if pattern_code else None
+    if display:
+        display_pattern, spaced_scansion = display
+        return _shared_mqdq_scansion(display_pattern, spaced_scansion, meter_names.get(meter_code, default_meter))
+    
+    # Fallback to stored scansion if pattern expansion fails
+    if not raw_scansion:
+        return None
+    if raw_meter_names is not None:
+        meter_names = raw_meter_names
+    return MqdqScansion(raw_scansion, ' '.join(raw_scansion), meter_names.get(meter_code, default_meter))
+
+# Meter code -> name tables for each lookup branch, with the branch's default meter.
+# Martial's stored-scansion fallback also maps D to pentameter, while expanded
+# patterns coded D stay hendecasyllable
+_MARTIAL_METERS = (
+    {'H': 'hexameter', 'P': 'pentameter'}, 'hendecasyllable',
+    {'H': 'hexameter', 'P': 'pentameter', 'D': 'pentameter'},
+)
+_ELEGIAC_BOOK_METERS = ({'H': 'hexameter'}, 'pentameter')
+_BOOK_SPECIFIC_METERS = ({'H': 'hexameter'}, 'hendecasyllable')
+_GENERIC_METERS = ({'H': 'hexameter', 'P': 'pentameter'}, 'elegiac')
+
+@lru_cache(maxsize=131072)
+def _lookup_mqdq_cached(locus):
+    """Resolve a locus against the MQDQ database (memoized on the raw locus, so repeats skip normalization)."""
     scansions = get_mqdq_scansions()
     if not scansions:
         return None
     
-    locus_clean = locus.strip('<>').replace(' ', '').lower()
-    
-    parts = locus_clean.split('.')
-    if len(parts) < 3:
+    parts = locus.strip('<>').replace(' ', '').lower().split('.')
+    n_parts = len(parts)
+    if n_parts < 3:
         return None
     
-    author_short = parts[0]
+    author_short, work_short, book = parts[:3]
+    poem = parts[3] if n_parts > 3 else None
+    line = parts[4] if n_parts > 4 else None
     author_key = TESS_TO_MQDQ_MAP.get(author_short, author_short)
     
     # Special handling for Martial
-    # Format 1: mart.BOOK.POEM.LINE (no work name) - parts[1].isdigit()
+    # Format 1: mart.BOOK.POEM.LINE (no work name) - BOOK is numeric
     # Format 2: martial.epigrams.BOOK.POEM.LINE - from feature extractor
     if author_key == 'martialis':
         book_num = None
         line_ref = None
         
-        if len(parts) >= 4 and parts[1].isdigit():
+        if poem is not None and work_short.isdigit():
             # Format: mart.9.84.10 -> book=9, line_ref=84.10
-            book_num = parts[1]
-            line_ref = f"{parts[2]}.{parts[3]}"
-        elif len(parts) >= 5 and parts[1] in ('epigrams', 'epigrammata') and parts[2].isdigit():
+            book_num = work_short
+            line_ref = f"{book}.{poem}"
+        elif line is not None and work_short in ('epigrams', 'epigrammata') and book.isdigit():
             # Format: martial.epigrams.9.84.10 -> book=9, line_ref=84.10
-            book_num = parts[2]
-            line_ref = f"{parts[3]}.{parts[4]}"
+            book_num = book
+            line_ref = f"{poem}.{line}"
         
         if book_num and line_ref:
-            mqdq_key = f"martialis.epigrammata_{book_num}"
-            
-            if mqdq_key in scansions:
-                work_data = scansions[mqdq_key]
-                if line_ref in work_data.get('lines', {}):
-                    line_data = work_data['lines'][line_ref]
-                    meter_code = line_data.get('meter', '')
-                    pattern_code = line_data.get('pattern', '')
-                    
-                    # Prefer expanding pattern code over using truncated scansion
-                    if pattern_code:
-                        expanded = expand_mqdq_pattern(pattern_code, meter_code)
-                        if expanded:
-                            display_pattern = expanded.replace('|', '')
-                            spaced_scansion = ' '.join(list(display_pattern))
-                            meter_name = 'hexameter' if meter_code == 'H' else ('pentameter' if meter_code == 'P' else 'hendecasyllable')
-                            return {
-                                'pattern': display_pattern,
-                                'raw': spaced_scansion,
-                                'valid': True,
-                                'meter': meter_name,
-                                'source': 'mqdq'
-                            }
-                    
-                    # Fallback to stored scansion if pattern expansion fails
-                    raw_scansion = line_data.get('scansion', '')
-                    if not raw_scansion:
-                        return None
-                    spaced_scansion = ' '.join(list(raw_scansion)) if raw_scansion else ''
-                    meter_name = 'hexameter' if meter_code == 'H' else ('pentameter' if meter_code in ('D', 'P') else 'hendecasyllable')
-                    return {
-                        'pattern': raw_scansion,
-                        'raw': spaced_scansion,
-                        'valid': True,
-                        'meter': meter_name,
-                        'source': 'mqdq'
-                    }
-            return None
-    
-    work_short = parts[1] if len(parts) > 1 else ''
-    
-    # Special handling for Ovid elegiac works with book-specific MQDQ keys
-    # Format: "ov.am.1.1.1" (author.work.book.poem.line) -> ouidius.amores_1, key "1.1"
-    if author_key == 'ouidius' and work_short in ELEGIAC_BOOK_WORKS and len(parts) >= 5:
-        work_name = ELEGIAC_BOOK_WORKS[work_short]
-        book_num = parts[2]
-        mqdq_key = f"ouidius.{work_name}_{book_num}"
-        line_ref = f"{parts[3]}.{parts[4]}"  # poem.line within book
-        
-        if mqdq_key in scansions:
-            work_data = scansions[mqdq_key]
-            if line_ref in work_data.get('lines', {}):
-                line_data = work_data['lines'][line_ref]
-                meter_code = line_data.get('meter', '')
-                pattern_code = line_data.get('pattern', '')
-                
-                # Prefer expanding pattern code over using truncated scansion
-                if pattern_code:
-                    expanded = expand_mqdq_pattern(pattern_code, meter_code)
-                    if expanded:
-                        display_pattern = expanded.replace('|', '')
-                        spaced_scansion = ' '.join(list(display_pattern))
-                        meter_name = 'hexameter' if meter_code == 'H' else 'pentameter'
-                        return {
-                            'pattern': display_pattern,
-                            'raw': spaced_scansion,
-                            'valid': True,
-                            'meter': meter_name,
-                            'source': 'mqdq'
-                        }
-                
-                # Fallback to stored scansion
-                raw_scansion = line_data.get('scansion', '')
-                if not raw_scansion:
-                    return None
-                spaced_scansion = ' '.join(list(raw_scansion)) if raw_scansion else ''
-                meter = 'hexameter' if meter_code == 'H' else 'pentameter'
-                return {
-                    'pattern': raw_scansion,
-                    'raw': spaced_scansion,
-                    'valid': True,
-                    'meter': meter,
-                    'source': 'mqdq'
-                }
-        return None
+            return _build_mqdq_result(scansions(f"martialis.epigrammata_{book_num}|{line_ref}"), *_MARTIAL_METERS)
     
-    # Special handling for Statius Silvae with book-specific MQDQ keys
+    # Special handling for works with book-specific MQDQ keys
+    # Format: "ov.am.1.1.1" (author.work.book.poem.line) -> ouidius.amores_1, key "1.1"
     # Format: "stat.silv.1.1.1" (author.work.book.poem.line) -> statius.siluae_1, key "1.1"
-    if author_key == 'statius' and work_short in BOOK_SPECIFIC_WORKS and len(parts) >= 5:
-        work_name = BOOK_SPECIFIC_WORKS[work_short]
-        book_num = parts[2]
-        mqdq_key = f"statius.{work_name}_{book_num}"
-        line_ref = f"{parts[3]}.{parts[4]}"  # poem.line within book
-        
-        if mqdq_key in scansions:
-            work_data = scansions[mqdq_key]
-            if line_ref in work_data.get('lines', {}):
-                line_data = work_data['lines'][line_ref]
-                meter_code = line_data.get('meter', '')
-                pattern_code = line_data.get('pattern', '')
-                
-                if pattern_code:
-                    expanded = expand_mqdq_pattern(pattern_code, meter_code)
-                    if expanded:
-                        display_pattern = expanded.replace('|', '')
-                        spaced_scansion = ' '.join(list(display_pattern))
-                        meter_name = 'hexameter' if meter_code == 'H' else 'hendecasyllable'
-                        return {
-                            'pattern': display_pattern,
-                            'raw': spaced_scansion,
-                            'valid': True,
-                            'meter': meter_name,
-                            'source': 'mqdq'
-                        }
-                
-                raw_scansion = line_data.get('scansion', '')
-                if not raw_scansion:
-                    return None
-                spaced_scansion = ' '.join(list(raw_scansion)) if raw_scansion else ''
-                meter_name = 'hexameter' if meter_code == 'H' else 'hendecasyllable'
-                return {
-                    'pattern': raw_scansion,
-                    'raw': spaced_scansion,
-                    'valid': True,
-                    'meter': meter_name,
-                    'source': 'mqdq'
-                }
-        return None
-    
-    work_key = None
-    for tess_work, mqdq_work in TESS_WORK_TO_MQDQ.items():
-        if work_short.startswith(tess_work):
-            work_key = mqdq_work
-            break
+    if author_key == 'ouidius' and work_short in ELEGIAC_BOOK_WORKS and line is not None:
+        work_name, meters = ELEGIAC_BOOK_WORKS[work_short], _ELEGIAC_BOOK_METERS
+    elif author_key == 'statius' and work_short in BOOK_SPECIFIC_WORKS and line is not None:
+        work_name, meters = BOOK_SPECIFIC_WORKS[work_short], _BOOK_SPECIFIC_METERS
+    else:
+        work_name = None
     
-    if not work_key:
-        work_key = work_short
+    if work_name:
+        mqdq_key = f"{author_key}.{work_name}_{book}".lower()
+        line_ref = f"{poem}.{line}"  # poem.line within book
+        return _build_mqdq_result(scansions(f"{mqdq_key}|{line_ref}"), *meters)
     
+    work_key = _match_tess_work(work_short) or work_short
     mqdq_key = f"{author_key}.{work_key}".lower()
     
     # Build line reference - be strict to avoid matching wrong lines
     line_refs_to_try = []
-    if len(parts) >= 5:
-        line_refs_to_try.append(f"{parts[3]}.{parts[4]}")  # poem.line
-    if len(parts) >= 4:
-        line_refs_to_try.append(f"{parts[2]}.{parts[3]}")
-    
-    for stored_key, work_data in scansions.items():
-        if stored_key.lower() == mqdq_key:
-            for line_ref in line_refs_to_try:
-                if line_ref in work_data.get('lines', {}):
-                    line_data = work_data['lines'][line_ref]
-                    meter_code = line_data.get('meter', '')
-                    pattern_code = line_data.get('pattern', '')
-                    
-                    # Prefer expanding pattern code over using truncated scansion
-                    if pattern_code:
-                        expanded = expand_mqdq_pattern(pattern_code, meter_code)
-                        if expanded:
-                            display_pattern = expanded.replace('|', '')
-                            spaced_scansion = ' '.join(list(display_pattern))
-                            meter_name = 'hexameter' if meter_code == 'H' else ('pentameter' if meter_code == 'P' else 'elegiac')
-                            return {
-                                'pattern': display_pattern,
-                                'raw': spaced_scansion,
-                                'valid': True,
-                                'meter': meter_name,
-                                'source': 'mqdq'
-                            }
-                    
-                    # Fallback to stored scansion
-                    raw_scansion = line_data.get('scansion', '')
-                    if not raw_scansion:
-                        continue
-                    spaced_scansion = ' '.join(list(raw_scansion)) if raw_scansion else ''
-                    meter_name = 'hexameter' if meter_code == 'H' else ('pentameter' if meter_code == 'P' else 'elegiac')
-                    return {
-                        'pattern': raw_scansion,
-                        'raw': spaced_scansion,
-                        'valid': True,
-                        'meter': meter_name,
-                        'source': 'mqdq'
-                    }
+    if line is not None:
+        line_refs_to_try.append(f"{poem}.{line}")  # poem.line
+    if poem is not None:
+        line_refs_to_try.append(f"{book}.{poem}")
+    
+    for line_ref in line_refs_to_try:
+        result = _build_mqdq_result(scansions(f"{mqdq_key}|{line_ref}"), *_GENERIC_METERS)
+        if result:
+            return result
     
     return None
 
@@ -498,6 +631,10 @@ def get_scansion_for_line(text_id, line_number, text=None):
     
     return None
 
+def is_cltk_available():
+    """Check if the CLTK scanners can be used as a fallback"""
+    return _CLTK_AVAILABLE
+
 def get_hexameter_scanner():
     """Lazy-load the Latin hexameter scanner"""
     global _hexameter_scanner
@@ -540,14 +677,20 @@ METER_TYPES = {
                 'tibullus.', 'tib.', 'propertius.', 'prop.', 'elegiae']
 }
 
+# One alternation per meter type, tried in METER_TYPES order (meter priority, not match position)
+_METER_TYPE_PATTERNS = [
+    (meter_type, re.compile('|'.join(map(re.escape, markers))))
+    for meter_type, markers in METER_TYPES.items()
+]
+
+@lru_cache(maxsize=4096)
 def detect_meter_type(text_id):
     """Detect which meter type a text uses based on its ID"""
     text_lower = text_id.lower()
     
-    for meter_type, markers in METER_TYPES.items():
-        for marker in markers:
-            if marker in text_lower:
-                return meter_type
+    for meter_type, pattern in _METER_TYPE_PATTERNS:
+        if pattern.search(text_lower):
+            return meter_type
     
     return 'hexameter'
 
@@ -563,6 +706,16 @@ def scan_latin_verse(text, meter_type='hexameter'):
     
     Only returns scansion if scanner marks it as valid to avoid incorrect displays.
     """
+    result = _scan_latin_verse_cached(text, meter_type)
+    return dict(result) if result else None
+
+@lru_cache(maxsize=50000)
+def _scan_latin_verse_cached(text, meter_type):
+    """Run the CLTK scanner for a verse (memoized; the scan is slow and lines repeat across searches)."""
+    prescanned = get_cltk_prescan().get(meter_type)
+    if prescanned and text in prescanned:
+        return prescanned[text]
+    
     try:
         if meter_type == 'hendecasyllable':
             scanner = get_hendecasyllable_scanner()
@@ -587,14 +740,16 @@ def scan_latin_verse(text, meter_type='hexameter'):
                 'meter': meter_type
             }
     except Exception as e:
-        print(f"Error scanning verse ({meter_type}): {e}")
+        logger.warning(f"Error scanning verse ({meter_type}): {e}")
     
     return None
 
+@lru_cache(maxsize=4096)
 def format_scansion_for_display(pattern):
     """
     Format a scansion pattern for display with proper symbols.
     Only formats if pattern looks valid.
+    Memoized: scansion patterns repeat heavily across lines.
     """
     if not pattern:
         return None
@@ -635,13 +790,52 @@ def calculate_metrical_similarity(pattern1, pattern2):
     if max_len == 0:
         return 0.0
     
-    matches = sum(1 for i in range(min_len) if p1[i] == p2[i])
+    matches = sum(map(operator.eq, p1, p2))
     
     length_penalty = min_len / max_len
     position_score = matches / min_len if min_len > 0 else 0
     
     return position_score * length_penalty
 
+def _pattern_codepoints(pattern):
+    """Normalize a pattern the same way as calculate_metrical_similarity and return its code points."""
+    clean = pattern.replace(' ', '').lower() if pattern else ''
+    return np.frombuffer(clean.encode('utf-32-le'), dtype=np.uint32)
+
+def calculate_metrical_similarity_batch(pattern, patterns):
+    """
+    Calculate similarity between one metrical pattern and many others at once.
+    Equivalent to calling calculate_metrical_similarity(pattern, p) for each p,
+    but compares all patterns position-by-position in a single numpy pass.
+    Returns a numpy array of scores 0.0-1.0, one per entry in patterns.
+    """
+    scores = np.zeros(len(patterns), dtype=np.float64)
+    src = _pattern_codepoints(pattern)
+    if not len(src) or not len(patterns):
+        return scores
+    
+    # Decode every target in one pass, then scatter the code points into padded rows
+    cleaned = [p.replace(' ', '').lower() if p else '' for p in patterns]
+    lengths = np.fromiter((len(p) for p in cleaned), dtype=np.intp, count=len(cleaned))
+    codes = np.frombuffer(''.join(cleaned).encode('utf-32-le'), dtype=np.uint32)
+    width = max(len(src), int(lengths.max()))
+    
+    # Pad source and targets with different sentinels so padding never counts as a match
+    src_row = np.full(width, 0xFFFFFFFF, dtype=np.uint32)
+    src_row[:len(src)] = src
+    tgt_rows = np.zeros((len(patterns), width), dtype=np.uint32)
+    rows = np.repeat(np.arange(len(patterns)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    tgt_rows[rows, np.arange(len(codes)) - np.repeat(starts, lengths)] = codes
+    
+    # Same operation order as calculate_metrical_similarity, so scores match it exactly
+    matches = (tgt_rows == src_row).sum(axis=1)
+    min_len = np.minimum(lengths, len(src))
+    max_len = np.maximum(lengths, len(src))
+    valid = lengths > 0
+    scores[valid] = matches[valid] / min_len[valid] * (min_len[valid] / max_len[valid])
+    return scores
+
 def format_scansion_display(text, pattern):
     """
     Format a line of text with scansion marks above/below.
@@ -650,6 +844,15 @@ def format_scansion_display(text, pattern):
     if not pattern:
         return text
     
+    return {
+        'text': text,
+        'scansion': _scansion_marks(pattern),
+        'pattern': pattern
+    }
+
+@lru_cache(maxsize=4096)
+def _scansion_marks(pattern):
+    """Map a '-'/'u' scansion pattern to display marks, blanking anything else (memoized per pattern)."""
     marks = []
     for char in pattern:
         if char == '-':
@@ -659,13 +862,7 @@ def format_scansion_display(text, pattern):
         else:
             marks.append(' ')
     
-    scansion_line = ''.join(marks)
-    
-    return {
-        'text': text,
-        'scansion': scansion_line,
-        'pattern': pattern
-    }
+    return ''.join(marks)
 
 POETRY_WORKS = {
     'la': [
@@ -809,6 +1006,72 @@ PROSE_WORKS = {
     ]
 }
 
+def _trie_pattern(markers):
+    """
+    Compile literal markers into one regex whose alternation is factored by shared prefixes,
+    so re tries each character once per position instead of restarting every marker.
+    """
+    trie = {}
+    for marker in markers:
+        node = trie
+        for char in marker:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A marker may end here, so the longer continuations are optional
+        return f'(?:{body})?' if '' in node else body
+    
+    return re.compile(build(trie))
+
+def _work_classifier(prose_markers, poetry_markers):
+    """
+    Return a function classifying a lowercased text id in one pass: True if it contains a
+    prose marker, False if it contains only poetry markers, None if it contains neither.
+    Uses one Aho-Corasick automaton over both lists when pyahocorasick is installed,
+    else one prefix-factored regex per list.
+    """
+    if ahocorasick is not None:
+        automaton = ahocorasick.Automaton()
+        # Prose added last so a marker on both lists counts as prose
+        for marker in poetry_markers:
+            automaton.add_word(marker, False)
+        for marker in prose_markers:
+            automaton.add_word(marker, True)
+        if not len(automaton):
+            return lambda text: None
+        automaton.make_automaton()
+        
+        def classify(text):
+            found_poetry = False
+            for _, is_prose in automaton.iter(text):
+                if is_prose:
+                    return True
+                found_poetry = True
+            return False if found_poetry else None
+        return classify
+    
+    prose = _trie_pattern(prose_markers) if prose_markers else None
+    poetry = _trie_pattern(poetry_markers) if poetry_markers else None
+    
+    def classify(text):
+        if prose and prose.search(text):
+            return True
+        if poetry and poetry.search(text):
+            return False
+        return None
+    return classify
+
+_WORK_CLASSIFIERS = {
+    language: _work_classifier(PROSE_WORKS.get(language, []), POETRY_WORKS.get(language, []))
+    for language in PROSE_WORKS.keys() | POETRY_WORKS.keys()
+}
+
+@lru_cache(maxsize=4096)
 def is_prose_text(text_id, language='la'):
     """
     Determine if a text is prose (not suitable for metrical analysis).
@@ -816,20 +1079,14 @@ def is_prose_text(text_id, language='la'):
     Checks prose markers first to handle naming conflicts (e.g., Apuleius's Metamorphoses vs Ovid's).
     Defaults to True (prose) for unknown texts to avoid false positives.
     """
-    text_lower = text_id.lower()
-    
-    prose_markers = PROSE_WORKS.get(language, [])
-    for marker in prose_markers:
-        if marker in text_lower:
-            return True
-    
-    poetry_markers = POETRY_WORKS.get(language, [])
-    for marker in poetry_markers:
-        if marker in text_lower:
-            return False
+    classify = _WORK_CLASSIFIERS.get(language)
+    if classify is None:
+        return True
     
-    return True
+    # Unknown texts (no marker either way) count as prose
+    return classify(text_id.lower()) is not False
 
+@lru_cache(maxsize=16384)
 def is_suitable_for_meter(source_id, target_id, language='la'):
     """
     Check if both source and target texts are suitable for metrical analysis.
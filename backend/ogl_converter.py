@@ -14,11 +14,15 @@ import os
 import re
 import sys
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from lxml import etree
 import unicodedata
 
 TEI_NS = {'tei': 'http://www.tei-c.org/ns/1.0'}
+TEI_DIV = '{http://www.tei-c.org/ns/1.0}div'
+TEI_BODY = '{http://www.tei-c.org/ns/1.0}body'
+TEI_HEADER = '{http://www.tei-c.org/ns/1.0}teiHeader'
 
 
 def normalize_text(text: str) -> str:
@@ -104,6 +108,49 @@ def get_text_from_element(elem) -> str:
     return ''.join(text_parts)
 
 
+def _is_leaf_div(div) -> bool:
+    """True if a textpart div has no nested textpart (or numbered) divs."""
+    nested = div.findall('./tei:div[@type="textpart"]', TEI_NS)
+    if not nested:
+        nested = div.findall('./tei:div[@n]', TEI_NS)
+    return not nested
+
+
+def _get_citation_path(elem) -> str:
+    """Build citation from ancestor @n attributes."""
+    path_parts = []
+    current = elem
+    while current is not None:
+        if hasattr(current, 'get'):
+            n = current.get('n')
+            if n:
+                path_parts.insert(0, n)
+        current = current.getparent()
+    return '.'.join(path_parts) if path_parts else '1'
+
+
+def _append_div_sections(div, sections: list, seen_citations: set) -> None:
+    """Append the sections of a leaf div (its paragraphs, or its whole text)."""
+    base_citation = _get_citation_path(div)
+    
+    paragraphs = div.findall('./tei:p', TEI_NS)
+    if paragraphs:
+        for i, p in enumerate(paragraphs, 1):
+            text = get_text_from_element(p)
+            text = normalize_text(text)
+            if text:
+                citation = f"{base_citation}.{i}" if len(paragraphs) > 1 else base_citation
+                if citation not in seen_citations:
+                    sections.append({'citation': citation, 'text': text})
+                    seen_citations.add(citation)
+    else:
+        text = get_text_from_element(div)
+        text = normalize_text(text)
+        if text and base_citation not in seen_citations:
+            sections.append({'citation': base_citation, 'text': text})
+            seen_citations.add(base_citation)
+
+
 def extract_sections(root) -> list:
     """Extract text sections with their citations.
     
@@ -126,45 +173,9 @@ def extract_sections(root) -> list:
     if not all_divs:
         all_divs = edition_div.findall('.//tei:div[@n]', TEI_NS)
     
-    leaf_divs = []
     for div in all_divs:
-        nested = div.findall('./tei:div[@type="textpart"]', TEI_NS)
-        if not nested:
-            nested = div.findall('./tei:div[@n]', TEI_NS)
-        if not nested:
-            leaf_divs.append(div)
-    
-    def get_citation_path(elem):
-        """Build citation from ancestor @n attributes."""
-        path_parts = []
-        current = elem
-        while current is not None:
-            if hasattr(current, 'get'):
-                n = current.get('n')
-                if n:
-                    path_parts.insert(0, n)
-            current = current.getparent()
-        return '.'.join(path_parts) if path_parts else '1'
-    
-    for div in leaf_divs:
-        base_citation = get_citation_path(div)
-        
-        paragraphs = div.findall('./tei:p', TEI_NS)
-        if paragraphs:
-            for i, p in enumerate(paragraphs, 1):
-                text = get_text_from_element(p)
-                text = normalize_text(text)
-                if text:
-                    citation = f"{base_citation}.{i}" if len(paragraphs) > 1 else base_citation
-                    if citation not in seen_citations:
-                        sections.append({'citation': citation, 'text': text})
-                        seen_citations.add(citation)
-        else:
-            text = get_text_from_element(div)
-            text = normalize_text(text)
-            if text and base_citation not in seen_citations:
-                sections.append({'citation': base_citation, 'text': text})
-                seen_citations.add(base_citation)
+        if _is_leaf_div(div):
+            _append_div_sections(div, sections, seen_citations)
     
     if not sections:
         paragraphs = edition_div.findall('.//tei:p', TEI_NS)
@@ -180,6 +191,84 @@ def extract_sections(root) -> list:
     return sections
 
 
+def _in_edition_div(div) -> bool:
+    """True if div sits inside the first body-level div[@type="edition"]."""
+    top = div
+    parent = top.getparent()
+    while parent is not None and parent.tag != TEI_BODY:
+        top = parent
+        parent = top.getparent()
+    if parent is None or top is div or top.get('type') != 'edition':
+        return False
+    previous = top.getprevious()
+    while previous is not None:
+        if previous.tag == TEI_DIV and previous.get('type') == 'edition':
+            return False
+        previous = previous.getprevious()
+    return True
+
+
+def handle_streamed_div(div, sections: list, seen_citations: set) -> None:
+    """Process one div 'end' event while stream-parsing a TEI document.
+    
+    Leaf textpart divs inside the edition are converted to sections as soon as
+    they are complete, then their content is released. Attributes are kept so
+    the parent's leaf check and citation paths still work.
+    """
+    if div.get('type') != 'textpart' or not _is_leaf_div(div) or not _in_edition_div(div):
+        return
+    
+    count = len(sections)
+    _append_div_sections(div, sections, seen_citations)
+    if len(sections) > count:
+        attrib = dict(div.attrib)
+        div.clear(keep_tail=True)
+        div.attrib.update(attrib)
+
+
+def finish_streamed_sections(root, sections: list) -> list:
+    """Return streamed sections, or fall back to extract_sections on the full tree.
+    
+    Nothing is released unless a section was produced, so when streaming
+    found no textparts the tree is still complete for the fallback strategies.
+    """
+    if sections:
+        return sections
+    return extract_sections(root)
+
+
+def stream_sections(source) -> tuple:
+    """Stream-parse a TEI file or file-like object and extract its sections.
+    
+    Equivalent to extract_sections(etree.parse(source).getroot()) but releases
+    each textpart as soon as it has been converted, so peak memory is bounded
+    by the header plus one section rather than the whole document.
+    
+    Returns: (root, sections); root still holds the header for extract_metadata.
+    """
+    sections = []
+    seen_citations = set()
+    
+    context = etree.iterparse(source, events=('end',), tag=TEI_DIV, huge_tree=True)
+    for _, div in context:
+        handle_streamed_div(div, sections, seen_citations)
+    
+    root = context.root
+    return root, finish_streamed_sections(root, sections)
+
+
+def read_header_metadata(source) -> dict:
+    """Extract metadata from the TEI header without parsing the body.
+    
+    Parsing stops as soon as teiHeader closes. The edition URN lives in the
+    body, so 'urn' is left empty; use extract_metadata on a full tree for it.
+    """
+    context = etree.iterparse(source, events=('end',), tag=TEI_HEADER, huge_tree=True)
+    for _, header in context:
+        return extract_metadata(header)
+    return extract_metadata(context.root)
+
+
 def generate_tess_id(metadata: dict) -> str:
     """Generate a .tess filename from metadata."""
     author = metadata['author'].lower()
@@ -202,13 +291,8 @@ def convert_xml_to_tess(xml_path: str, output_path: str = None) -> dict:
     
     Returns metadata about the conversion.
     """
-    with open(xml_path, 'rb') as f:
-        content = f.read()
-    
-    root = etree.fromstring(content)
-    
+    root, sections = stream_sections(xml_path)
     metadata = extract_metadata(root)
-    sections = extract_sections(root)
     
     if not sections:
         return {'success': False, 'error': 'No text content found', 'metadata': metadata}
@@ -218,13 +302,13 @@ def convert_xml_to_tess(xml_path: str, output_path: str = None) -> dict:
     if output_path is None:
         output_path = f"{tess_id}.tess"
     
-    lines = []
-    for section in sections:
-        citation = f"<{tess_id} {section['citation']}>"
-        lines.append(f"{citation}\t{section['text']}")
+    lines = (f"<{tess_id} {section['citation']}>\t{section['text']}" for section in sections)
     
     with open(output_path, 'w', encoding='utf-8') as f:
-        f.write('\n'.join(lines))
+        f.write(next(lines))
+        for line in lines:
+            f.write('\n')
+            f.write(line)
     
     return {
         'success': True,
@@ -236,14 +320,55 @@ def convert_xml_to_tess(xml_path: str, output_path: str = None) -> dict:
     }
 
 
-def batch_convert(input_dir: str, output_dir: str, language: str = None) -> list:
+def _convert_one(xml_file: str, output_dir: str, language: str = None) -> tuple:
+    """Convert one file for batch_convert workers.
+    
+    The output file is claimed with O_EXCL before converting, so when two
+    inputs map to the same tess id only one of them is written.
+    
+    Returns: (result or None if skipped, progress message)
+    """
+    try:
+        metadata = read_header_metadata(xml_file)
+        
+        if language and metadata['language'] != language:
+            return None, f"Skipping (language: {metadata['language']})"
+        
+        tess_id = generate_tess_id(metadata)
+        output_file = os.path.join(output_dir, f"{tess_id}.tess")
+        
+        try:
+            os.close(os.open(output_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return None, "Skipping (already exists)"
+        
+        try:
+            result = convert_xml_to_tess(xml_file, output_file)
+        except Exception:
+            os.remove(output_file)
+            raise
+        
+        if result['success']:
+            return result, f"Created {result['tess_id']}.tess ({result['section_count']} sections, {result['word_count']} words)"
+        os.remove(output_file)
+        return result, f"Failed: {result.get('error', 'Unknown error')}"
+        
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'file': xml_file}, f"Error: {e}"
+
+
+def batch_convert(input_dir: str, output_dir: str, language: str = None, max_workers: int = None) -> list:
     """
     Batch convert all XML files in a directory.
     
+    Files are converted in parallel worker processes and reported in
+    completion order.
+    
     Args:
         input_dir: Directory containing XML files
         output_dir: Directory for output .tess files
         language: Optional filter for language ('la', 'grc', 'en')
+        max_workers: Worker process count (defaults to the CPU count)
     
     Returns:
         List of conversion results
@@ -257,41 +382,16 @@ def batch_convert(input_dir: str, output_dir: str, language: str = None) -> list
     
     print(f"Found {len(xml_files)} XML files to process")
     
-    for i, xml_file in enumerate(xml_files):
-        try:
-            print(f"[{i+1}/{len(xml_files)}] Processing {xml_file.name}...")
-            
-            with open(xml_file, 'rb') as f:
-                content = f.read()
-            root = etree.fromstring(content)
-            metadata = extract_metadata(root)
-            
-            if language and metadata['language'] != language:
-                print(f"  Skipping (language: {metadata['language']})")
-                continue
-            
-            tess_id = generate_tess_id(metadata)
-            output_file = output_path / f"{tess_id}.tess"
-            
-            if output_file.exists():
-                print(f"  Skipping (already exists)")
-                continue
-            
-            result = convert_xml_to_tess(str(xml_file), str(output_file))
-            results.append(result)
-            
-            if result['success']:
-                print(f"  Created {result['tess_id']}.tess ({result['section_count']} sections, {result['word_count']} words)")
-            else:
-                print(f"  Failed: {result.get('error', 'Unknown error')}")
-                
-        except Exception as e:
-            print(f"  Error: {e}")
-            results.append({
-                'success': False,
-                'error': str(e),
-                'file': str(xml_file)
-            })
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_convert_one, str(xml_file), str(output_path), language): xml_file
+            for xml_file in xml_files
+        }
+        for i, future in enumerate(as_completed(futures)):
+            result, message = future.result()
+            print(f"[{i+1}/{len(xml_files)}] {futures[future].name}: {message}")
+            if result is not None:
+                results.append(result)
     
     successful = sum(1 for r in results if r.get('success'))
     print(f"\nCompleted: {successful}/{len(results)} files converted successfully")
@@ -305,11 +405,12 @@ def main():
     parser.add_argument('output', help='Output .tess file or directory')
     parser.add_argument('--batch', action='store_true', help='Batch convert directory')
     parser.add_argument('--language', choices=['la', 'grc', 'en'], help='Filter by language')
+    parser.add_argument('--workers', type=int, help='Worker processes for --batch (default: CPU count)')
     
     args = parser.parse_args()
     
     if args.batch:
-        batch_convert(args.input, args.output, args.language)
+        batch_convert(args.input, args.output, args.language, args.workers)
     else:
         result = convert_xml_to_tess(args.input, args.output)
         if result['success']:
@@ -28,8 +28,7 @@ from datetime import datetime
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from backend.ogl_converter import convert_xml_to_tess, extract_metadata
-from lxml import etree
+from backend.ogl_converter import convert_xml_to_tess, read_header_metadata
 
 BASE_DIR = Path(__file__).parent.parent
 CORPUS_DIR = BASE_DIR / "texts"
@@ -273,9 +272,7 @@ def ingest_texts(repo_name: str, test_mode: bool = True, limit: int = 5) -> dict
         print(f"\n   [{i+1}/{len(xml_files)}] {xml_file.name}")
         
         try:
-            with open(xml_file, 'rb') as f:
-                root = etree.fromstring(f.read())
-            metadata = extract_metadata(root)
+            metadata = read_header_metadata(str(xml_file))
             
             from backend.ogl_converter import generate_tess_id
             tess_id = generate_tess_id(metadata)
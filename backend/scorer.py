@@ -22,7 +22,7 @@ Reference:
     Based on Coffee et al. (2012) "Intertextuality in the Digital Age"
     and the original Tesserae V3 implementation by Chris Forstall.
 """
-from collections import Counter
+from collections import Counter, defaultdict
 import math
 from backend.feature_extractor import feature_extractor
 from backend.bigram_frequency import calculate_bigram_boost, is_bigram_cache_available
@@ -33,19 +33,18 @@ class Scorer:
     
     def build_corpus_frequencies(self, units_list):
         """Build corpus-wide frequency table from multiple texts"""
-        all_lemmas = []
+        self.corpus_frequencies = Counter()
         for units in units_list:
             for unit in units:
-                all_lemmas.extend(unit['lemmas'])
-        self.corpus_frequencies = Counter(all_lemmas)
+                self.corpus_frequencies.update(unit['lemmas'])
         return self.corpus_frequencies
     
     def get_text_frequencies(self, units):
         """Get frequency table for a single text"""
-        all_lemmas = []
+        freq = Counter()
         for unit in units:
-            all_lemmas.extend(unit['lemmas'])
-        return Counter(all_lemmas)
+            freq.update(unit['lemmas'])
+        return freq
     
     def score_matches(self, matches, source_units, target_units, settings=None, source_id='', target_id=''):
         """Score matches using V3-style algorithm with frequency and distance"""
@@ -60,24 +59,15 @@ class Scorer:
             total_words = sum(self.corpus_frequencies.values())
         else:
             # For exact match, use token frequencies; otherwise use lemma frequencies
-            if match_type == 'exact':
-                all_tokens = []
-                for unit in source_units:
-                    all_tokens.extend(unit.get('tokens', []))
-                for unit in target_units:
-                    all_tokens.extend(unit.get('tokens', []))
-                freq = Counter(all_tokens)
-                total_words = len(all_tokens)
-            else:
-                all_lemmas = []
-                for unit in source_units:
-                    all_lemmas.extend(unit['lemmas'])
-                for unit in target_units:
-                    all_lemmas.extend(unit['lemmas'])
-                freq = Counter(all_lemmas)
-                total_words = len(all_lemmas)
+            freq = Counter()
+            for units in (source_units, target_units):
+                for unit in units:
+                    freq.update(unit.get('tokens', []) if match_type == 'exact' else unit['lemmas'])
+            total_words = sum(freq.values())
         
         results = []
+        # Lemma matches are featured per source unit in one batch once every match is scored
+        lemma_results = defaultdict(list)
         
         for match in matches:
             src_unit = source_units[match['source_idx']]
@@ -153,31 +143,6 @@ class Scorer:
                 max_score = len(matched_lemmas) * math.log(total_words + 1) if total_words > 0 else 1
                 normalized_score = min(raw_score / max_score, 1.0) if max_score > 0 else 0
                 
-                features = feature_extractor.extract_features(
-                    src_unit, tgt_unit, matched_lemmas, settings,
-                    source_id=self._current_source_id, target_id=self._current_target_id
-                )
-                
-                boosted_score = feature_extractor.boost_score(normalized_score, features, settings)
-                
-                language = settings.get('language', 'la')
-                bigram_boost = 0.0
-                shared_rare_bigrams = []
-                use_bigram_boost = settings.get('bigram_boost', False)
-                if use_bigram_boost and is_bigram_cache_available(language):
-                    bigram_weight = feature_extractor.weights.get('bigram_boost', 0.5)
-                    src_lemmas = src_unit.get('lemmas', [])
-                    tgt_lemmas = tgt_unit.get('lemmas', [])
-                    bigram_boost = calculate_bigram_boost(src_lemmas, tgt_lemmas, language, bigram_weight)
-                    if bigram_boost > 0:
-                        boosted_score += bigram_boost
-                        from backend.bigram_frequency import find_shared_rare_bigrams
-                        rare_bgs = find_shared_rare_bigrams(src_lemmas, tgt_lemmas, language, min_rarity=0.8)
-                        shared_rare_bigrams = [{'bigram': bg.replace('|', ' + '), 'rarity': round(r, 3)} for bg, r in rare_bgs]
-                
-                features['bigram_boost'] = bigram_boost
-                features['shared_rare_bigrams'] = shared_rare_bigrams
-                
                 results.append({
                     'source': {
                         'ref': src_unit['ref'],
@@ -194,13 +159,53 @@ class Scorer:
                     'matched_words': word_scores,
                     'source_distance': src_distance,
                     'target_distance': tgt_distance,
-                    'overall_score': boosted_score,
+                    'overall_score': normalized_score,
                     'base_score': normalized_score,
-                    'features': features
+                    'features': None
                 })
+                lemma_results[match['source_idx']].append((len(results) - 1, tgt_unit, matched_lemmas))
+        
+        for source_idx, group in lemma_results.items():
+            self._apply_features(source_units[source_idx], group, results, settings)
         
         return results
     
+    def _apply_features(self, src_unit, group, results, settings):
+        """Extract and boost features for one source unit's lemma matches in one batch each"""
+        features_list = feature_extractor.extract_features_batch(
+            src_unit, [tgt_unit for _, tgt_unit, _ in group], [matched_lemmas for _, _, matched_lemmas in group],
+            settings, source_id=self._current_source_id, target_id=self._current_target_id
+        )
+        
+        boosted_scores = feature_extractor.boost_scores_batch(
+            [results[result_idx]['base_score'] for result_idx, _, _ in group], features_list, settings
+        )
+        
+        language = settings.get('language', 'la')
+        use_bigram_boost = settings.get('bigram_boost', False) and is_bigram_cache_available(language)
+        
+        for (result_idx, tgt_unit, _), features, boosted_score in zip(group, features_list, boosted_scores.tolist()):
+            result = results[result_idx]
+            
+            bigram_boost = 0.0
+            shared_rare_bigrams = []
+            if use_bigram_boost:
+                bigram_weight = feature_extractor.weights.get('bigram_boost', 0.5)
+                src_lemmas = src_unit.get('lemmas', [])
+                tgt_lemmas = tgt_unit.get('lemmas', [])
+                bigram_boost = calculate_bigram_boost(src_lemmas, tgt_lemmas, language, bigram_weight)
+                if bigram_boost > 0:
+                    boosted_score += bigram_boost
+                    from backend.bigram_frequency import find_shared_rare_bigrams
+                    rare_bgs = find_shared_rare_bigrams(src_lemmas, tgt_lemmas, language, min_rarity=0.8)
+                    shared_rare_bigrams = [{'bigram': bg.replace('|', ' + '), 'rarity': round(r, 3)} for bg, r in rare_bgs]
+            
+            features['bigram_boost'] = bigram_boost
+            features['shared_rare_bigrams'] = shared_rare_bigrams
+            
+            result['overall_score'] = boosted_score
+            result['features'] = features
+    
     def _score_sound_match(self, match, src_unit, tgt_unit, settings):
         """Score a sound-based match (trigram similarity)"""
         sound_score = match.get('sound_score', 0)
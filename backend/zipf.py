@@ -77,11 +77,9 @@ def analyze_frequency_distribution(units):
     Analyze the frequency distribution of lemmas in text units.
     Returns frequency counter and distribution stats.
     """
-    all_lemmas = []
+    freq = Counter()
     for unit in units:
-        all_lemmas.extend(unit['lemmas'])
-    
-    freq = Counter(all_lemmas)
+        freq.update(unit['lemmas'])
     
     sorted_freqs = [f for _, f in freq.most_common()]
     
@@ -89,7 +87,7 @@ def analyze_frequency_distribution(units):
         return freq, {}
     
     stats = {
-        'total_tokens': len(all_lemmas),
+        'total_tokens': sum(sorted_freqs),
         'unique_lemmas': len(freq),
         'max_frequency': sorted_freqs[0] if sorted_freqs else 0,
         'median_frequency': sorted_freqs[len(sorted_freqs)//2] if sorted_freqs else 0,
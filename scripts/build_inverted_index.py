@@ -5,13 +5,16 @@ Maps lemma → list of (text_id, line_ref, positions) for instant lookups.
 """
 import os
 import sys
-import json
 import sqlite3
 import argparse
 from pathlib import Path
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from backend.text_processor import TextProcessor
+from backend.inverted_index import (
+    COVERING_INDEX_SQL, INDEX_JOURNAL_PRAGMA, LEMMA_DICT_VERSION, LEMMA_DICT_TABLE_SQL, POSTINGS_TABLE_SQL,
+    encode_positions, get_lemma_ids, migrate_lemma_dict
+)
 
 TEXTS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'texts')
 INDEX_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'inverted_index')
@@ -38,6 +41,8 @@ def build_index(language, text_processor, verbose=True, resume=True):
             existing_files = {row[0] for row in cursor.fetchall()}
             if verbose and existing_files:
                 print(f"  Resuming: {len(existing_files)} files already indexed")
+            if existing_files and migrate_lemma_dict(conn) and verbose:
+                print("  Migrated postings to dictionary-encoded lemma ids")
             conn.close()
         except:
             pass
@@ -56,22 +61,17 @@ def build_index(language, text_processor, verbose=True, resume=True):
             )
         ''')
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS postings (
-                lemma TEXT,
-                text_id INTEGER,
-                ref TEXT,
-                positions TEXT,
-                FOREIGN KEY (text_id) REFERENCES texts(text_id)
-            )
-        ''')
+        cursor.execute(LEMMA_DICT_TABLE_SQL)
+        cursor.execute(POSTINGS_TABLE_SQL.format(table='postings'))
         
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_lemma ON postings(lemma)')
+        cursor.execute(COVERING_INDEX_SQL)
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_text ON postings(text_id)')
+        cursor.execute(f'PRAGMA user_version = {LEMMA_DICT_VERSION}')
         conn.commit()
         conn.close()
     
     conn = sqlite3.connect(db_path)
+    conn.execute(INDEX_JOURNAL_PRAGMA)
     cursor = conn.cursor()
     
     text_files = get_text_files(language)
@@ -109,6 +109,7 @@ def build_index(language, text_processor, verbose=True, resume=True):
             text_id = cursor.fetchone()[0]
             continue
         text_id = cursor.lastrowid
+        lemma_ids = get_lemma_ids(conn, {lemma for unit in units for lemma in unit.get('lemmas', [])})
         
         for unit in units:
             ref = unit.get('ref', '')
@@ -123,7 +124,7 @@ def build_index(language, text_processor, verbose=True, resume=True):
             for lemma, positions in lemma_positions.items():
                 cursor.execute(
                     'INSERT INTO postings (lemma, text_id, ref, positions) VALUES (?, ?, ?, ?)',
-                    (lemma, text_id, ref, json.dumps(positions))
+                    (lemma_ids[lemma], text_id, ref, encode_positions(positions))
                 )
                 total_postings += 1
         
@@ -133,6 +134,8 @@ def build_index(language, text_processor, verbose=True, resume=True):
                 print(f"  Processed {i + 1}/{remaining} files...")
     
     conn.commit()
+    cursor.execute('PRAGMA analysis_limit=400')
+    cursor.execute('ANALYZE')
     
     cursor.execute('SELECT COUNT(DISTINCT lemma) FROM postings')
     unique_lemmas = cursor.fetchone()[0]
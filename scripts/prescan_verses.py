@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Pre-scan Latin verse lines with CLTK so searches never run the scanner inline.
+Writes data/scansion/cltk_prescan.json as {meter_type: {verse text: scansion}},
+which metrical_scanner consults before falling back to a live CLTK scan.
+Lines already covered by MQDQ are skipped. Resumable: verses already in the file are kept.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.metrical_scanner import (
+    CLTK_PRESCAN_FILE, SCANSION_DIR,
+    detect_meter_type, get_cltk_prescan, is_cltk_available, is_prose_text, lookup_mqdq_scansion, scan_latin_verse
+)
+
+TEXTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'texts', 'la')
+SAVE_EVERY = 20
+
+def get_author_work(filename):
+    """Derive the author.work id used for scansion lookups (mirrors FeatureExtractor._get_scansion_with_mqdq)"""
+    fname_parts = filename.replace('.tess', '').split('.')
+    if 'part' in fname_parts:
+        return '.'.join(fname_parts[:fname_parts.index('part')])
+    return '.'.join(fname_parts[:2])
+
+def iter_verses(filepath):
+    """Yield (ref, text) for each line unit, parsed the same way as TextProcessor.process_file"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            match = re.match(r'^<([^>]+)>\s*(.+)$', line)
+            if match:
+                yield match.group(1), match.group(2)
+
+def save_prescan(table):
+    """Write the prescan table next to the MQDQ database"""
+    os.makedirs(SCANSION_DIR, exist_ok=True)
+    path = os.path.join(SCANSION_DIR, CLTK_PRESCAN_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+def prescan(verbose=True):
+    """Scan every verse line of the Latin poetry corpus that MQDQ does not cover"""
+    table = {meter_type: dict(verses) for meter_type, verses in get_cltk_prescan().items()}
+    filenames = sorted(f for f in os.listdir(TEXTS_DIR) if f.endswith('.tess')) if os.path.isdir(TEXTS_DIR) else []
+    
+    scanned = 0
+    for i, filename in enumerate(filenames):
+        author_work = get_author_work(filename)
+        if is_prose_text(filename, 'la'):
+            continue
+        meter_type = detect_meter_type(author_work)
+        verses = table.setdefault(meter_type, {})
+        
+        for ref, text in iter_verses(os.path.join(TEXTS_DIR, filename)):
+            if text in verses:
+                continue
+            line_num = ref.strip().split()[-1] if ref.strip() else ''
+            if lookup_mqdq_scansion(f"{author_work}.{line_num}"):
+                continue
+            verses[text] = scan_latin_verse(text, meter_type)
+            scanned += 1
+        
+        if (i + 1) % SAVE_EVERY == 0:
+            save_prescan(table)
+            if verbose:
+                print(f"  Processed {i + 1}/{len(filenames)} files, {scanned} new verses scanned...")
+    
+    path = save_prescan(table)
+    if verbose:
+        total = sum(len(verses) for verses in table.values())
+        print(f"  Completed: {scanned} new verses, {total} total")
+        print(f"  Saved to: {path}")
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-scan Latin verse with CLTK for Tesserae meter scoring')
+    parser.add_argument('--quiet', '-q', action='store_true', help='Suppress output')
+    args = parser.parse_args()
+    
+    if not is_cltk_available():
+        print("CLTK is not installed; nothing to pre-scan.")
+        return
+    
+    prescan(verbose=not args.quiet)
+    print("Done!")
+
+if __name__ == '__main__':
+    main()